@@ -0,0 +1,50 @@
+import timeit
+from datetime import datetime, timedelta
+from lib.utils import timestamps
+
+ROUNDS = 5
+
+
+def make_values(count):
+    start = datetime(2026, 1, 5, 8, 30)
+    return [
+        (start + timedelta(minutes=50 * i)).strftime("%Y-%m-%dT%H:%M:%S.000+01:00")
+        for i in range(count)
+    ]
+
+
+def run(name, func, values):
+    best = min(
+        timeit.repeat(lambda: [func(v) for v in values], number=1, repeat=ROUNDS)
+    )
+    per_call = best / len(values) * 1e9
+    print(f"{name:<28} {per_call:8.0f} ns/call")
+    return per_call
+
+
+def main():
+    unique = make_values(4000)
+    repeated = make_values(60) * 50
+
+    def strptime(value):
+        return datetime.strptime(value, timestamps.SOMTODAY_FORMAT)
+
+    def parse_cold(value):
+        timestamps.parse.cache_clear()
+        return timestamps.parse(value)
+
+    for value in unique:
+        assert timestamps.parse(value) == strptime(value)
+
+    print(f"Parsing {len(unique)} unique and {len(repeated)} repeated timestamps\n")
+    baseline = run("strptime", strptime, unique)
+    cold = run("parse (cache miss)", parse_cold, unique)
+    timestamps.parse.cache_clear()
+    warm = run("parse (repeated values)", timestamps.parse, repeated)
+
+    print(f"\nCache miss speedup:     {baseline / cold:5.1f}x")
+    print(f"Repeated value speedup: {baseline / warm:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,220 @@
-import os
 import json
-from lib.utils import logger
+import asyncio
+import hashlib
+import requests
+from lib.utils import config, logger, metrics
+from lib.services.records import encode, to_dicts
+from lib.services.state_store import get_state_store
 
 
 class BaseMonitor:
+    name = None
+    record_type = None
+    auth_failed = False
+    fingerprint = None
+
     def __init__(self, username, user_config, app_config, api):
         self.username = username
         self.user_config = user_config
         self.app_config = app_config
         self.api = api
         self.data_dir = app_config["paths"]["data_dir"]
+        self.store = get_state_store(app_config)
 
     def run(self, access_token, notifiers):
+        if not self.start_run():
+            return
+
+        processed_data = self.fetch_and_process(access_token)
+        result = self.check_changes(processed_data, access_token)
+        if result is None:
+            return
+
+        fingerprint, processed_data, changes = result
+        if changes and not self.send_notifications(changes, notifiers):
+            return
+
+        self.finish_run(fingerprint, processed_data, changes)
+
+    async def arun(self, access_token, notifiers, api):
+        if not self.start_run():
+            return
+
+        processed_data = await api.call(self.fetch_and_process, access_token)
+        result = await asyncio.to_thread(
+            self.check_changes, processed_data, access_token
+        )
+        if result is None:
+            return
+
+        fingerprint, processed_data, changes = result
+        if changes and not await self.asend_notifications(changes, notifiers):
+            return
+
+        await asyncio.to_thread(self.finish_run, fingerprint, processed_data, changes)
+
+    def start_run(self):
         if not self.is_enabled():
             logger.console_info(
                 f"{self.__class__.__name__} disabled, skipping", indent=4
             )
-            return
+            return False
 
+        self.auth_failed = False
         logger.console_print("Fetching data from API...", indent=4)
+        return True
+
+    def check_changes(self, processed_data, access_token):
+        if processed_data is None:
+            return None
+
+        fingerprint = self.get_fingerprint(processed_data)
+        if self.is_unchanged(fingerprint):
+            return None
+
+        result = self.detect_changes(processed_data, access_token)
+        if result is None:
+            return None
+
+        processed_data, changes = result
+        if changes:
+            self.log_change_count(changes)
+        return fingerprint, processed_data, changes
+
+    def send_notifications(self, changes, notifiers):
         try:
-            raw_data = self.fetch_data(access_token)
+            self.notify_changes(changes, notifiers)
         except Exception as e:
-            logger.log_error(
-                self.username, f"{self.__class__.__name__} failed to fetch data", e
-            )
-            return
+            self.log_notify_failure(e)
+            return False
+
+        logger.console_success("Notifications sent", indent=4)
+        return True
 
-        logger.console_print("Processing data...", indent=4)
+    async def asend_notifications(self, changes, notifiers):
         try:
-            processed_data = self.process_data(raw_data)
+            await self.anotify_changes(changes, notifiers)
+        except Exception as e:
+            self.log_notify_failure(e)
+            return False
+
+        logger.console_success("Notifications sent", indent=4)
+        return True
+
+    def finish_run(self, fingerprint, processed_data, changes):
+        self.store_data(processed_data, changes)
+        self.save_fingerprint(fingerprint)
+
+    def fetch_and_process(self, access_token):
+        try:
+            raw_data = self.fetch_data(access_token)
+            logger.console_print("Processing data...", indent=4)
+            return self.process_data(raw_data)
+        except requests.RequestException as e:
+            self.handle_fetch_error(e)
         except Exception as e:
             logger.log_error(
                 self.username, f"{self.__class__.__name__} failed to process data", e
             )
+        return None
+
+    def handle_fetch_error(self, exception):
+        response = getattr(exception, "response", None)
+        if getattr(response, "status_code", None) == 401:
+            self.auth_failed = True
+
+        logger.log_error(
+            self.username, f"{self.__class__.__name__} failed to fetch data", exception
+        )
+
+    def get_fingerprint_context(self):
+        return config.get(self.user_config, f"monitoring.{self.name}", {})
+
+    def get_fingerprint(self, processed_data):
+        payload = json.dumps(
+            [self.get_fingerprint_context(), processed_data],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=encode,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_unchanged(self, fingerprint):
+        if fingerprint != self.load_fingerprint():
+            return False
+
+        metrics.increment("short_circuited_runs")
+        logger.console_info("No changes detected (same response as last run)", indent=4)
+        return True
+
+    def load_fingerprint(self):
+        if self.fingerprint is None:
+            self.fingerprint = self.store.get_value(
+                self.username, f"{self.name}.fingerprint"
+            )
+        return self.fingerprint
+
+    def save_fingerprint(self, fingerprint):
+        if fingerprint == self.fingerprint:
             return
 
+        self.store.set_value(self.username, f"{self.name}.fingerprint", fingerprint)
+        self.fingerprint = fingerprint
+
+    def detect_changes(self, processed_data, access_token):
         logger.console_print("Loading cached data...", indent=4)
         cached_data = self.load_cached_data()
 
         if cached_data is None:
             logger.console_info("No cached data found, initializing...", indent=4)
             self.save_data(processed_data)
-            return
+            return None
 
         logger.console_print("Comparing with cached data...", indent=4)
         try:
-            changes = self.compare_data(cached_data, processed_data)
+            changes = self.compare_data(cached_data, processed_data, access_token)
         except Exception as e:
             logger.log_error(
                 self.username, f"{self.__class__.__name__} failed to compare data", e
             )
-            return
+            return None
+
+        return processed_data, changes
 
+    def store_data(self, processed_data, changes):
+        self.save_data(processed_data)
         if changes:
-            change_count = len(changes) if isinstance(changes, list) else 1
-            logger.console_print(
-                f"Found {change_count} change(s), sending notifications...", indent=4
-            )
-            try:
-                self.notify_changes(changes, notifiers)
-                logger.console_success("Notifications sent", indent=4)
-            except Exception as e:
-                logger.log_error(
-                    self.username,
-                    f"{self.__class__.__name__} failed to send notifications",
-                    e,
-                )
-                logger.console_warning(
-                    "Skipping cache save so changes are retried next run", indent=4
-                )
-                return
-            self.save_data(processed_data)
             logger.console_success("Data saved", indent=4)
         else:
             logger.console_info("No changes detected", indent=4)
-            self.save_data(processed_data)
 
-    def get_user_data_path(self, filename):
-        user_dir = os.path.join(self.data_dir, self.username)
-        os.makedirs(user_dir, exist_ok=True)
-        return os.path.join(user_dir, filename)
+    def log_change_count(self, changes):
+        change_count = len(changes) if isinstance(changes, list) else 1
+        logger.console_print(
+            f"Found {change_count} change(s), sending notifications...", indent=4
+        )
 
-    def load_json_file(self, path):
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                return json.load(f)
-        return None
+    def log_notify_failure(self, exception):
+        logger.log_error(
+            self.username,
+            f"{self.__class__.__name__} failed to send notifications",
+            exception,
+        )
+        logger.console_warning(
+            "Skipping cache save so changes are retried next run", indent=4
+        )
+
+    def load_cached_data(self):
+        return self.load_records(self.name)
+
+    def save_data(self, data):
+        self.save_records(self.name, data)
+
+    def load_records(self, collection):
+        items = self.store.load(self.username, collection)
+        if items is None:
+            return None
+        return [self.record_type.from_dict(item) for item in items]
 
-    def save_json_file(self, path, data):
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+    def save_records(self, collection, records):
+        self.store.save(self.username, collection, to_dicts(records))
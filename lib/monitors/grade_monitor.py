@@ -1,76 +1,276 @@
+import json
+import time
+import hashlib
+from datetime import datetime
 from lib.monitors.base_monitor import BaseMonitor
-from lib.utils import config
+from lib.services.records import Grade
+from lib.utils import config, logger
+
+COMPARED_FIELDS = (
+    "formattedResultaat",
+    "cijfer",
+    "cijferHerkansing1",
+    "formattedHerkansing1",
+    "weging",
+    "examenWeging",
+    "teltNietmee",
+    "vrijstelling",
+    "periode",
+)
 
 
 class GradeMonitor(BaseMonitor):
+    name = "grades"
+    record_type = Grade
+    log_position = None
+    pending_events = 0
+    stale_checkpoint = False
+    cached_grades = None
+    incremental = False
+    probe = None
+    full_synced_at = None
+
     def is_enabled(self):
         return config.get_grades_enabled(self.user_config)
 
     def fetch_data(self, access_token):
         leerling_id = self.user_config["auth"]["leerling_id"]
-        return self.api.fetch_grades(access_token, leerling_id)
+        self.cached_grades = None
+        self.probe = None
+        self.full_synced_at = None
+        full_sync_due = self.is_full_sync_due()
+
+        if not full_sync_due and config.get_grades_probe(self.user_config):
+            if self.is_probe_unchanged(access_token, leerling_id):
+                logger.console_print(
+                    "Grade probe unchanged, skipping download", indent=4
+                )
+                self.incremental = True
+                return []
+
+        self.incremental = not full_sync_due and self.use_incremental_sync()
+        if self.incremental:
+            return self.api.iter_grade_dossiers(access_token, leerling_id)
+        return [self.api.iter_grade_pages(access_token, leerling_id)]
+
+    def get_full_sync_time(self):
+        incremental = config.get_grades_incremental_sync(self.user_config)
+        if incremental or config.get_grades_probe(self.user_config):
+            return time.time()
+        return None
+
+    def is_full_sync_due(self):
+        full_synced_at = self.store.get_value(
+            self.username, f"{self.name}.full_synced_at", 0
+        )
+        interval = config.get_grades_full_sync_interval(self.user_config)
+        return time.time() - full_synced_at >= interval
+
+    def use_incremental_sync(self):
+        if not config.get_grades_incremental_sync(self.user_config):
+            return False
+
+        self.cached_grades = self.load_cached_data()
+        return self.cached_grades is not None
+
+    def is_probe_unchanged(self, access_token, leerling_id):
+        probe = []
+        for grade, total in self.api.probe_grades(access_token, leerling_id):
+            if grade is None:
+                probe.append([total, None, None])
+            else:
+                probe.append(
+                    [
+                        total,
+                        grade.datumInvoerEerstePoging,
+                        self.get_content_hash(grade),
+                    ]
+                )
+
+        if probe != self.store.get_value(self.username, f"{self.name}.probe"):
+            self.probe = probe
+            return False
+
+        self.cached_grades = self.load_cached_data()
+        return self.cached_grades is not None
+
+    def save_sync_state(self):
+        if self.probe is not None:
+            self.store.set_value(self.username, f"{self.name}.probe", self.probe)
+            self.probe = None
+
+        if self.full_synced_at is not None:
+            self.store.set_value(
+                self.username, f"{self.name}.full_synced_at", self.full_synced_at
+            )
+            self.full_synced_at = None
+
+    def is_unchanged(self, fingerprint):
+        unchanged = super().is_unchanged(fingerprint)
+        if unchanged:
+            self.save_sync_state()
+        return unchanged
+
+    def save_fingerprint(self, fingerprint):
+        super().save_fingerprint(fingerprint)
+        self.save_sync_state()
 
     def process_data(self, raw_data):
         filters = config.get_grades_filters(self.user_config)
+        known = {}
+        if self.incremental:
+            known = {self.make_key(g): g.contentHash for g in self.cached_grades}
+
         grades = []
+        page_count = 0
+        for pages in raw_data:
+            for page in pages:
+                page_count += 1
+                kept = [grade for grade in page if self.is_included(grade, filters)]
+                for grade in kept:
+                    grade.contentHash = self.get_content_hash(grade)
+                grades.extend(kept)
+
+                if (
+                    self.incremental
+                    and kept
+                    and all(
+                        known.get(self.make_key(grade)) == grade.contentHash
+                        for grade in kept
+                    )
+                ):
+                    break
+
+        if self.incremental:
+            if page_count:
+                logger.console_print(
+                    f"Incremental sync, fetched {page_count} page(s)", indent=4
+                )
+            grades = self.merge_cached(grades)
+        else:
+            self.full_synced_at = self.get_full_sync_time()
+
+        self.sort_grades(grades)
+        return grades
 
-        for entry in raw_data:
-            if not isinstance(entry, dict):
-                continue
+    def is_included(self, grade, filters):
+        if not self.has_valid_result(grade):
+            return False
+        if grade.type in filters["exclude_types"]:
+            return False
+        return grade.vaknaam not in filters["exclude_subjects"]
 
-            if not self.has_valid_result(entry):
-                continue
+    def merge_cached(self, grades):
+        fetched = {self.make_key(grade) for grade in grades}
+        return grades + [
+            grade for grade in self.cached_grades if self.make_key(grade) not in fetched
+        ]
 
-            entry_type = entry.get("type", "")
-            if entry_type in filters["exclude_types"]:
-                continue
-
-            additional = entry.get("additionalObjects", {})
-            subject_name = additional.get("vaknaam", "")
-            if subject_name in filters["exclude_subjects"]:
-                continue
+    def has_valid_result(self, entry):
+        has_cijfer = entry.get("cijfer") is not None
+        has_formatted = entry.get("formattedResultaat") not in [None, ""]
+        has_label = entry.get("label") not in [None, ""]
+        return has_cijfer or has_formatted or has_label
 
-            clean_entry = {}
-            for k, v in entry.items():
-                if k in ["links", "permissions", "$type"]:
-                    continue
-                clean_entry[k] = v
+    def get_content_hash(self, grade):
+        values = [grade.get(field) for field in COMPARED_FIELDS]
+        return hashlib.sha1(json.dumps(values).encode()).hexdigest()[:16]
 
-            grades.append(clean_entry)
+    def make_key(self, grade):
+        subject = grade.get("vaknaam", "")
+        test = grade.get("omschrijving", "")
+        if grade.kolomId is not None:
+            return (subject, test, grade.kolomId)
+        return (subject, test)
 
+    def sort_grades(self, grades):
         grades.sort(
-            key=lambda x: x.get("datumInvoerEerstePoging", ""),
+            key=lambda grade: grade.get("datumInvoerEerstePoging", ""),
             reverse=True,
         )
 
+    def load_cached_data(self):
+        if self.cached_grades is not None:
+            return self.cached_grades
+
+        checkpoint = self.load_records(self.name)
+        position = self.store.get_value(self.username, f"{self.name}.log_position")
+        events, self.log_position = self.store.read_log(
+            self.username, self.name, position
+        )
+        self.pending_events = len(events)
+
+        if checkpoint is None and not events:
+            return None
+
+        grades = self.apply_events(checkpoint or [], events)
+        self.stale_checkpoint = False
+        for grade in grades:
+            if grade.contentHash is None:
+                grade.contentHash = self.get_content_hash(grade)
+                self.stale_checkpoint = True
         return grades
 
-    def has_valid_result(self, entry):
-        has_cijfer = entry.get("cijfer") is not None
-        has_formatted = entry.get("formattedResultaat") not in [None, ""]
-        has_label = entry.get("label") not in [None, ""]
-        return has_cijfer or has_formatted or has_label
+    def apply_events(self, grades, events):
+        current = {self.make_key(g): g for g in grades}
+        for event in events:
+            grade = Grade.from_dict(event["grade"])
+            key = self.make_key(grade)
+            if event["type"] == "REMOVED":
+                current.pop(key, None)
+            else:
+                current[key] = grade
 
-    def load_cached_data(self):
-        path = self.get_user_data_path("grades.json")
-        return self.load_json_file(path)
+        grades = list(current.values())
+        self.sort_grades(grades)
+        return grades
 
     def save_data(self, data):
-        path = self.get_user_data_path("grades.json")
-        self.save_json_file(path, data)
-
-    def compare_data(self, old_data, new_data):
-        def make_key(grade):
-            additional = grade.get("additionalObjects", {})
-            subject = additional.get("vaknaam", "")
-            test = grade.get("omschrijving", "")
-            kolom_id = grade.get("kolomId")
-            if kolom_id is not None:
-                return (subject, test, kolom_id)
-            return (subject, test)
-
-        old_dict = {make_key(g): g for g in old_data}
-        new_dict = {make_key(g): g for g in new_data}
+        self.save_records(self.name, data)
+        self.store.set_value(
+            self.username, f"{self.name}.log_position", self.log_position
+        )
+        self.pending_events = 0
+        self.stale_checkpoint = False
+        self.save_sync_state()
+
+    def store_data(self, processed_data, changes):
+        if not changes:
+            if self.stale_checkpoint:
+                self.save_data(processed_data)
+                logger.console_print("Refreshed grade checkpoint", indent=4)
+            logger.console_info("No changes detected", indent=4)
+            return
+
+        self.log_position = self.store.append_log(
+            self.username, self.name, self.get_events(changes)
+        )
+        self.pending_events += len(changes)
+
+        compact_every = config.get_grade_log_compact_every(self.app_config)
+        if self.pending_events >= compact_every or self.stale_checkpoint:
+            self.save_data(processed_data)
+            logger.console_print("Compacted grade history", indent=4)
+
+        logger.console_success("Data saved", indent=4)
+
+    def get_events(self, changes):
+        timestamp = datetime.now().isoformat()
+        events = []
+        for change in changes:
+            event = {
+                "type": change["type"],
+                "time": timestamp,
+                "grade": (change.get("new_grade") or change["grade"]).to_dict(),
+            }
+            if "changes" in change:
+                event["changes"] = change["changes"]
+            events.append(event)
+        return events
+
+    def compare_data(self, old_data, new_data, access_token=None):
+        old_dict = {self.make_key(g): g for g in old_data}
+        new_dict = {self.make_key(g): g for g in new_data}
 
         changes = []
 
@@ -79,87 +279,15 @@ class GradeMonitor(BaseMonitor):
                 changes.append({"type": "NEW", "grade": grade})
 
         for key, new_grade in new_dict.items():
-            if key in old_dict:
-                old_grade = old_dict[key]
-                grade_changes = {}
-
-                old_result = old_grade.get("formattedResultaat", "")
-                new_result = new_grade.get("formattedResultaat", "")
-                if old_result != new_result:
-                    grade_changes["resultaat"] = {"old": old_result, "new": new_result}
-
-                old_cijfer = old_grade.get("cijfer")
-                new_cijfer = new_grade.get("cijfer")
-                if old_cijfer != new_cijfer and "resultaat" not in grade_changes:
-                    grade_changes["resultaat"] = {
-                        "old": old_result or str(old_cijfer),
-                        "new": new_result or str(new_cijfer),
-                    }
-
-                old_has_herkansing = old_grade.get("cijferHerkansing1") is not None
-                new_has_herkansing = new_grade.get("cijferHerkansing1") is not None
-
-                if new_has_herkansing and not old_has_herkansing:
-                    changes.append(
-                        {
-                            "type": "NEW_HERKANSING",
-                            "grade": new_grade,
-                            "original_result": old_grade.get(
-                                "formattedEerstePoging", ""
-                            ),
-                            "herkansing_result": new_grade.get(
-                                "formattedHerkansing1", ""
-                            ),
-                        }
-                    )
-                elif new_has_herkansing and old_has_herkansing:
-                    old_herk_result = old_grade.get("formattedHerkansing1", "")
-                    new_herk_result = new_grade.get("formattedHerkansing1", "")
-                    if old_herk_result != new_herk_result:
-                        grade_changes["herkansing_resultaat"] = {
-                            "old": old_herk_result,
-                            "new": new_herk_result,
-                        }
-
-                if old_grade.get("weging") != new_grade.get("weging"):
-                    grade_changes["weging"] = {
-                        "old": old_grade.get("weging"),
-                        "new": new_grade.get("weging"),
-                    }
-
-                if old_grade.get("examenWeging") != new_grade.get("examenWeging"):
-                    grade_changes["examenWeging"] = {
-                        "old": old_grade.get("examenWeging"),
-                        "new": new_grade.get("examenWeging"),
-                    }
-
-                if old_grade.get("teltNietmee") != new_grade.get("teltNietmee"):
-                    grade_changes["teltNietmee"] = {
-                        "old": old_grade.get("teltNietmee"),
-                        "new": new_grade.get("teltNietmee"),
-                    }
-
-                if old_grade.get("vrijstelling") != new_grade.get("vrijstelling"):
-                    grade_changes["vrijstelling"] = {
-                        "old": old_grade.get("vrijstelling"),
-                        "new": new_grade.get("vrijstelling"),
-                    }
-
-                if old_grade.get("periode") != new_grade.get("periode"):
-                    grade_changes["periode"] = {
-                        "old": old_grade.get("periode"),
-                        "new": new_grade.get("periode"),
-                    }
-
-                if grade_changes:
-                    changes.append(
-                        {
-                            "type": "CHANGED",
-                            "old_grade": old_grade,
-                            "new_grade": new_grade,
-                            "changes": grade_changes,
-                        }
-                    )
+            old_grade = old_dict.get(key)
+            if old_grade is None:
+                continue
+
+            if old_grade.get("contentHash") != new_grade.get("contentHash"):
+                change_count = len(changes)
+                self.compare_grade(old_grade, new_grade, changes)
+                if len(changes) == change_count:
+                    self.stale_checkpoint = True
 
         for key, grade in old_dict.items():
             if key not in new_dict:
@@ -176,7 +304,91 @@ class GradeMonitor(BaseMonitor):
 
         return changes
 
+    def compare_grade(self, old_grade, new_grade, changes):
+        grade_changes = {}
+
+        old_result = old_grade.get("formattedResultaat", "")
+        new_result = new_grade.get("formattedResultaat", "")
+        if old_result != new_result:
+            grade_changes["resultaat"] = {"old": old_result, "new": new_result}
+
+        old_cijfer = old_grade.get("cijfer")
+        new_cijfer = new_grade.get("cijfer")
+        if old_cijfer != new_cijfer and "resultaat" not in grade_changes:
+            grade_changes["resultaat"] = {
+                "old": old_result or str(old_cijfer),
+                "new": new_result or str(new_cijfer),
+            }
+
+        old_has_herkansing = old_grade.get("cijferHerkansing1") is not None
+        new_has_herkansing = new_grade.get("cijferHerkansing1") is not None
+
+        if new_has_herkansing and not old_has_herkansing:
+            changes.append(
+                {
+                    "type": "NEW_HERKANSING",
+                    "grade": new_grade,
+                    "original_result": old_grade.get("formattedEerstePoging", ""),
+                    "herkansing_result": new_grade.get("formattedHerkansing1", ""),
+                }
+            )
+        elif new_has_herkansing and old_has_herkansing:
+            old_herk_result = old_grade.get("formattedHerkansing1", "")
+            new_herk_result = new_grade.get("formattedHerkansing1", "")
+            if old_herk_result != new_herk_result:
+                grade_changes["herkansing_resultaat"] = {
+                    "old": old_herk_result,
+                    "new": new_herk_result,
+                }
+
+        if old_grade.get("weging") != new_grade.get("weging"):
+            grade_changes["weging"] = {
+                "old": old_grade.get("weging"),
+                "new": new_grade.get("weging"),
+            }
+
+        if old_grade.get("examenWeging") != new_grade.get("examenWeging"):
+            grade_changes["examenWeging"] = {
+                "old": old_grade.get("examenWeging"),
+                "new": new_grade.get("examenWeging"),
+            }
+
+        if old_grade.get("teltNietmee") != new_grade.get("teltNietmee"):
+            grade_changes["teltNietmee"] = {
+                "old": old_grade.get("teltNietmee"),
+                "new": new_grade.get("teltNietmee"),
+            }
+
+        if old_grade.get("vrijstelling") != new_grade.get("vrijstelling"):
+            grade_changes["vrijstelling"] = {
+                "old": old_grade.get("vrijstelling"),
+                "new": new_grade.get("vrijstelling"),
+            }
+
+        if old_grade.get("periode") != new_grade.get("periode"):
+            grade_changes["periode"] = {
+                "old": old_grade.get("periode"),
+                "new": new_grade.get("periode"),
+            }
+
+        if grade_changes:
+            changes.append(
+                {
+                    "type": "CHANGED",
+                    "old_grade": old_grade,
+                    "new_grade": new_grade,
+                    "changes": grade_changes,
+                }
+            )
+
     def notify_changes(self, changes, notifiers):
         for grade in changes:
             for notifier in notifiers:
                 notifier.send_grade_notification(self.username, self.user_config, grade)
+
+    async def anotify_changes(self, changes, notifiers):
+        for grade in changes:
+            for notifier in notifiers:
+                await notifier.send_grade_notification(
+                    self.username, self.user_config, grade
+                )
@@ -1,127 +1,142 @@
-from datetime import datetime, timedelta
+import time
+import asyncio
+import threading
+from datetime import date, datetime, timedelta
 from lib.monitors.base_monitor import BaseMonitor
-from lib.utils import config, logger
+from lib.services.records import Lesson, lessons_from_dicts, to_dicts
+from lib.utils import config, logger, timestamps
 
+TEMPLATE_MIN_WEEKS = 2
+TEMPLATE_MIN_WEIGHT = 0.05
+TEMPLATE_WEEKS_KEPT = 52
 
-class ScheduleMonitor(BaseMonitor):
-    def is_enabled(self):
-        return config.get_schedule_enabled(self.user_config)
+_template_locks = {}
+_template_locks_lock = threading.Lock()
 
-    def run(self, access_token, notifiers):
-        if not self.is_enabled():
-            logger.console_info(
-                f"{self.__class__.__name__} is disabled, skipping", indent=4
-            )
-            return
 
-        logger.console_print("Fetching current week data...", indent=4)
-        try:
-            raw_data, rolled_over = self.fetch_data(access_token)
-        except Exception as e:
-            logger.log_error(
-                self.username, f"{self.__class__.__name__} failed to fetch data", e
-            )
-            return
+def get_template_lock(username):
+    with _template_locks_lock:
+        return _template_locks.setdefault(username, threading.Lock())
 
-        logger.console_print("Processing data...", indent=4)
-        try:
-            processed_data = self.process_data(raw_data)
-        except Exception as e:
-            logger.log_error(
-                self.username, f"{self.__class__.__name__} failed to process data", e
-            )
-            return
 
-        logger.console_print("Loading cached data...", indent=4)
-        cached_data = self.load_cached_data()
+class ScheduleMonitor(BaseMonitor):
+    name = "schedule"
+    record_type = Lesson
+    rolled_over = False
+    week_start = None
+    lesson_index = None
+    horizon_weeks = None
+    partial_dates = None
+    week_fetched_at = None
+    horizon_fetched_at = None
+    current_lessons = None
+    refreshing_standard_schedule = False
 
-        if cached_data is None:
-            logger.console_info("Initializing cache...", indent=4)
-            self.save_data(processed_data)
-            return
+    def is_enabled(self):
+        return config.get_schedule_enabled(self.user_config)
 
-        logger.console_print("Comparing with cached data...", indent=4)
-        try:
-            changes = self.compare_data(cached_data, processed_data, access_token)
-        except Exception as e:
-            logger.log_error(
-                self.username, f"{self.__class__.__name__} failed to compare data", e
+    def fetch_data(self, access_token):
+        monday, saturday, week_number, rolled_over = self.get_week_dates()
+        horizon_weeks = self.get_due_horizon_weeks(monday)
+        partial_dates = None
+        if not horizon_weeks:
+            partial_dates = self.get_fast_path_dates(monday, rolled_over)
+
+        if partial_dates:
+            day_after = date.fromisoformat(partial_dates[-1]) + timedelta(days=1)
+            raw_schedule = self.api.fetch_schedule(
+                access_token, partial_dates[0], day_after.isoformat()
             )
-            return
-
-        if changes:
-            change_count = len(changes) if isinstance(changes, list) else 1
-            logger.console_print(
-                f"Found {change_count} change(s), sending notifications...", indent=4
+            raw_schedule = [
+                entry
+                for entry in raw_schedule
+                if entry.get("beginDatumTijd", "")[:10] in partial_dates
+            ]
+        elif horizon_weeks:
+            horizon_end = date.fromisoformat(horizon_weeks[-1]) + timedelta(
+                days=config.get_schedule_fetch_end_day(self.user_config)
+            )
+            raw_schedule = self.api.fetch_schedule_range(
+                access_token, monday, horizon_end.isoformat()
             )
-            try:
-                self.notify_changes(changes, notifiers, rolled_over)
-                logger.console_success("Notifications sent", indent=4)
-            except Exception as e:
-                logger.log_error(
-                    self.username,
-                    f"{self.__class__.__name__} failed to send notifications",
-                    e,
-                )
-                logger.console_warning(
-                    "Skipping cache save so changes are retried next run", indent=4
-                )
-                return
-            self.save_data(processed_data)
-            logger.console_success("Data saved", indent=4)
         else:
-            logger.console_info("No changes detected", indent=4)
-            self.save_data(processed_data)
-
-    def fetch_data(self, access_token):
-        monday, saturday, week_number, rolled_over = self.get_week_dates()
-        raw_schedule = self.api.fetch_schedule(access_token, monday, saturday)
-        return raw_schedule, rolled_over
+            raw_schedule = self.api.fetch_schedule(access_token, monday, saturday)
 
-    def clean_nested_object(self, obj):
-        if not isinstance(obj, dict):
-            return obj
+        self.week_fetched_at = None if partial_dates else time.time()
+        self.horizon_fetched_at = time.time() if horizon_weeks else None
+        self.rolled_over = rolled_over
+        self.week_start = monday
+        self.horizon_weeks = horizon_weeks
+        self.partial_dates = partial_dates
+        self.current_lessons = None
+        return raw_schedule
 
-        cleaned = {}
-        for k, v in obj.items():
-            if k in ["links", "permissions", "$type"]:
-                continue
-            if k == "additionalObjects" and (not v or v == {}):
-                continue
+    def get_fast_path_dates(self, week_start, rolled_over):
+        if rolled_over or not config.get_schedule_fast_path(self.user_config):
+            return None
 
-            if isinstance(v, dict):
-                cleaned[k] = self.clean_nested_object(v)
-            elif isinstance(v, list):
-                cleaned[k] = [
-                    self.clean_nested_object(item) if isinstance(item, dict) else item
-                    for item in v
-                ]
-            else:
-                cleaned[k] = v
-
-        return cleaned
+        now = datetime.now()
+        start_hour, end_hour = config.get_schedule_fast_path_hours(self.user_config)
+        end_day = config.get_schedule_fetch_end_day(self.user_config)
+        if not start_hour <= now.hour < end_hour or now.weekday() > end_day:
+            return None
+
+        week_fetched = self.store.get_value(self.username, "schedule.week_fetched", {})
+        interval = config.get_schedule_full_week_interval(self.user_config)
+        if week_fetched.get("week") != week_start:
+            return None
+        if time.time() - week_fetched.get("time", 0) >= interval:
+            return None
+
+        dates = [now.date()]
+        tomorrow = now.date() + timedelta(days=1)
+        if config.get_schedule_fast_path_tomorrow(self.user_config):
+            if tomorrow.weekday() <= end_day:
+                dates.append(tomorrow)
+
+        return [d.isoformat() for d in dates]
+
+    def get_due_horizon_weeks(self, week_start):
+        weeks = config.get_schedule_horizon_weeks(self.user_config)
+        if weeks <= 1:
+            return None
+
+        interval = config.get_schedule_horizon_interval(self.user_config)
+        fetched_at = self.store.get_value(
+            self.username, "schedule.horizon_fetched_at", 0
+        )
+        if time.time() - fetched_at < interval:
+            return None
+
+        monday = date.fromisoformat(week_start)
+        return [
+            (monday + timedelta(weeks=offset)).isoformat() for offset in range(1, weeks)
+        ]
+
+    def get_fingerprint_context(self):
+        return [
+            super().get_fingerprint_context(),
+            self.week_start,
+            self.horizon_weeks,
+            self.partial_dates,
+        ]
 
     def process_data(self, raw_data):
         processed_lessons = []
         filters = config.get_schedule_filters(self.user_config)
         exclude_subjects = filters.get("exclude_subjects", [])
 
-        for entry in raw_data:
-            clean_entry = self.clean_nested_object(entry)
-            begin_lesuur = clean_entry.get("beginLesuur")
-            eind_lesuur = clean_entry.get("eindLesuur")
-
-            if begin_lesuur is None or eind_lesuur is None:
+        for lesson in raw_data:
+            if lesson.beginLesuur is None or lesson.eindLesuur is None:
                 continue
 
-            vakken = clean_entry.get("vakken", [])
             subject_name = ""
             has_subject = False
-            if vakken:
+            if lesson.vak is not None:
                 has_subject = True
-                subject_name = vakken[0].get("afkorting", "")
+                subject_name = lesson.vak
             else:
-                titel = clean_entry.get("titel", "")
+                titel = lesson.get("titel", "")
                 if titel:
                     parts = [p.strip() for p in titel.split("-")]
                     if len(parts) >= 3:
@@ -137,7 +152,7 @@ class ScheduleMonitor(BaseMonitor):
             if subject_name and subject_name in exclude_subjects:
                 continue
 
-            processed_lessons.append(clean_entry)
+            processed_lessons.append(lesson)
 
         return processed_lessons
 
@@ -168,53 +183,167 @@ class ScheduleMonitor(BaseMonitor):
 
         return monday_str, end_day_str, str(week_number), rolled_over
 
-    def load_cached_data(self):
-        path = self.get_user_data_path("schedule.json")
-        return self.load_json_file(path)
-
-    def save_data(self, data):
-        path = self.get_user_data_path("schedule.json")
-        self.save_json_file(path, data)
-
     def compare_data(self, old_data, new_data, access_token):
+        if self.partial_dates:
+            return self.compare_partial(old_data, new_data)
+
         monday, saturday, current_week, _ = self.get_week_dates()
+        new_data, horizon = self.split_horizon(new_data)
 
-        old_week = None
-        if old_data:
-            for entry in old_data:
-                begin_datum_tijd = entry.get("beginDatumTijd", "")
-                if begin_datum_tijd:
-                    try:
-                        dt = datetime.strptime(
-                            begin_datum_tijd, "%Y-%m-%dT%H:%M:%S.%f%z"
-                        )
-                        old_week = str(dt.isocalendar()[1])
-                        break
-                    except (ValueError, AttributeError):
-                        pass
+        old_index = self.build_lesson_index(old_data or [])
+        new_index = self.build_lesson_index(new_data)
+        self.lesson_index = new_index
 
+        old_week = old_index["week"]
         if old_week != current_week:
             logger.console_info(
                 f"Week changed from {old_week} to {current_week}", indent=4
             )
-            logger.console_print("Generating standard schedule on-the-fly...", indent=4)
-            standard_schedule = self.find_best_standard_schedule(access_token)
+            if old_data:
+                self.learn_weeks(self.split_into_weeks(old_data))
+
+            standard_schedule = self.get_learned_schedule()
+            if standard_schedule is None:
+                standard_schedule = self.get_standard_schedule(access_token, monday)
             if not standard_schedule:
                 logger.console_warning(
                     "Could not generate standard schedule, skipping comparison",
                     indent=4,
                 )
-                return []
+                changes = []
             else:
-                old_lessons = standard_schedule
+                old_index = self.build_lesson_index(standard_schedule)
+                changes = self.compare_schedules(old_index, new_index)
         else:
-            old_lessons = old_data
+            changes = self.compare_schedules(old_index, new_index)
 
-        new_lessons = new_data
-        changes = self.compare_schedules(old_lessons, new_lessons)
+        if horizon:
+            changes.extend(self.compare_horizon(horizon))
 
         return changes
 
+    def split_horizon(self, lessons):
+        if not self.horizon_weeks:
+            return lessons, {}
+
+        end_day = config.get_schedule_fetch_end_day(self.user_config)
+        current = []
+        horizon = {week: [] for week in self.horizon_weeks}
+
+        for lesson in lessons:
+            try:
+                dt = timestamps.parse(lesson.get("beginDatumTijd", ""))
+            except (ValueError, TypeError):
+                current.append(lesson)
+                continue
+
+            monday = (dt.date() - timedelta(days=dt.weekday())).isoformat()
+            if monday in horizon:
+                if dt.weekday() <= end_day:
+                    horizon[monday].append(lesson)
+            else:
+                current.append(lesson)
+
+        return current, horizon
+
+    def compare_horizon(self, horizon):
+        cache = self.store.load(self.username, "schedule_horizon") or {}
+        baseline = None
+        changes = []
+
+        for week, lessons in sorted(horizon.items()):
+            old_lessons = cache.get(week)
+            if old_lessons is not None:
+                old_lessons = lessons_from_dicts(old_lessons)
+            else:
+                if not lessons:
+                    continue
+                if baseline is None:
+                    baseline = self.get_learned_schedule() or []
+                old_lessons = baseline
+
+            if not old_lessons:
+                continue
+
+            week_number = str(date.fromisoformat(week).isocalendar()[1])
+            week_changes = self.compare_schedules(
+                self.build_lesson_index(old_lessons), self.build_lesson_index(lessons)
+            )
+            for change in week_changes:
+                change["week"] = week_number
+            changes.extend(week_changes)
+
+        return changes
+
+    def compare_partial(self, old_data, new_data):
+        old_lessons = [
+            lesson
+            for lesson in old_data
+            if lesson.get("beginDatumTijd", "")[:10] in self.partial_dates
+        ]
+        self.current_lessons = self.merge_partial(old_data, new_data)
+        self.lesson_index = None
+
+        return self.compare_schedules(
+            self.build_lesson_index(old_lessons), self.build_lesson_index(new_data)
+        )
+
+    def merge_partial(self, cached, lessons):
+        merged = [
+            lesson
+            for lesson in cached
+            if lesson.get("beginDatumTijd", "")[:10] not in self.partial_dates
+        ]
+        merged.extend(lessons)
+        merged.sort(key=lambda lesson: lesson.get("beginDatumTijd", ""))
+        return merged
+
+    def save_data(self, data):
+        if self.partial_dates:
+            cached = self.load_cached_data()
+            if cached is None:
+                return
+            data = self.merge_partial(cached, data)
+
+        data, horizon = self.split_horizon(data)
+        super().save_data(data)
+
+        if horizon:
+            horizon = {week: to_dicts(lessons) for week, lessons in horizon.items()}
+            self.store.save(self.username, "schedule_horizon", horizon)
+
+        self.save_week_fetched()
+        self.save_horizon_fetched()
+
+    def is_unchanged(self, fingerprint):
+        unchanged = super().is_unchanged(fingerprint)
+        if unchanged:
+            self.save_week_fetched()
+            self.save_horizon_fetched()
+        return unchanged
+
+    def save_week_fetched(self):
+        if self.week_fetched_at is None:
+            return
+        if not config.get_schedule_fast_path(self.user_config):
+            return
+
+        self.store.set_value(
+            self.username,
+            "schedule.week_fetched",
+            {"week": self.week_start, "time": self.week_fetched_at},
+        )
+        self.week_fetched_at = None
+
+    def save_horizon_fetched(self):
+        if self.horizon_fetched_at is None:
+            return
+
+        self.store.set_value(
+            self.username, "schedule.horizon_fetched_at", self.horizon_fetched_at
+        )
+        self.horizon_fetched_at = None
+
     def get_lesson_hours(self, entry):
         begin = entry.get("beginLesuur")
         end = entry.get("eindLesuur")
@@ -225,18 +354,8 @@ class ScheduleMonitor(BaseMonitor):
         return (end - begin) + 1
 
     def extract_lesson_info(self, entry):
-        vakken = entry.get("vakken", [])
-        if vakken:
-            subject = vakken[0].get("afkorting", "")
-        else:
-            subject = ""
-
-        docenten = entry.get("docenten", [])
-        if docenten:
-            teacher = docenten[0].get("afkorting", "")
-        else:
-            teacher = ""
-
+        subject = entry.get("vak", "")
+        teacher = entry.get("docent", "")
         locatie = entry.get("locatie", "")
 
         if not subject or not teacher:
@@ -256,15 +375,18 @@ class ScheduleMonitor(BaseMonitor):
                     if not teacher:
                         teacher = parts[1]
 
+        day_index = 0
+        week = None
+        start_time = ""
         begin_datum_tijd = entry.get("beginDatumTijd", "")
         if begin_datum_tijd:
             try:
-                dt = datetime.strptime(begin_datum_tijd, "%Y-%m-%dT%H:%M:%S.%f%z")
+                dt = timestamps.parse(begin_datum_tijd)
                 day_index = dt.weekday()
-            except (ValueError, AttributeError):
-                day_index = 0
-        else:
-            day_index = 0
+                week = str(dt.isocalendar()[1])
+                start_time = dt.strftime("%H:%M")
+            except (ValueError, TypeError):
+                pass
 
         period = entry.get("beginLesuur")
 
@@ -273,41 +395,59 @@ class ScheduleMonitor(BaseMonitor):
             "teacher": teacher,
             "location": locatie,
             "day": day_index,
+            "week": week,
             "period": period,
+            "start_time": start_time,
         }
 
-    def compare_schedules(self, old_lessons, new_lessons):
+    def build_lesson_index(self, lessons):
+        index = {"week": None, "lessons": [], "days": {}}
+
+        for lesson in lessons:
+            info = self.extract_lesson_info(lesson)
+            index["lessons"].append((lesson, info))
+            if index["week"] is None:
+                index["week"] = info["week"]
+
+            day = index["days"].get(info["day"])
+            if day is None:
+                day = self.empty_day_index()
+                index["days"][info["day"]] = day
+
+            subject = info["subject"]
+            period = info["period"]
+            if subject:
+                hours = self.get_lesson_hours(lesson)
+                day["subject_hours"][subject] = (
+                    day["subject_hours"].get(subject, 0) + hours
+                )
+                day["subject_lessons"].setdefault(subject, []).append(info)
+                if period is not None:
+                    day["subject_periods"].setdefault(subject, set()).add(period)
+
+            if period is not None:
+                day["by_period"].setdefault(period, []).append(info)
+
+        return index
+
+    def empty_day_index(self):
+        return {
+            "subject_hours": {},
+            "subject_periods": {},
+            "subject_lessons": {},
+            "by_period": {},
+        }
+
+    def compare_schedules(self, old_index, new_index):
         changes = []
+        empty_day = self.empty_day_index()
 
         for day in range(5):
-            old_day_info = [
-                (l, self.extract_lesson_info(l))
-                for l in old_lessons
-                if self.extract_lesson_info(l)["day"] == day
-            ]
-            new_day_info = [
-                (l, self.extract_lesson_info(l))
-                for l in new_lessons
-                if self.extract_lesson_info(l)["day"] == day
-            ]
+            old_day = old_index["days"].get(day, empty_day)
+            new_day = new_index["days"].get(day, empty_day)
 
-            old_subject_hours = {}
-            for lesson, info in old_day_info:
-                subject = info["subject"]
-                if subject:
-                    hours = self.get_lesson_hours(lesson)
-                    old_subject_hours[subject] = (
-                        old_subject_hours.get(subject, 0) + hours
-                    )
-
-            new_subject_hours = {}
-            for lesson, info in new_day_info:
-                subject = info["subject"]
-                if subject:
-                    hours = self.get_lesson_hours(lesson)
-                    new_subject_hours[subject] = (
-                        new_subject_hours.get(subject, 0) + hours
-                    )
+            old_subject_hours = old_day["subject_hours"]
+            new_subject_hours = new_day["subject_hours"]
 
             all_subjects = set(old_subject_hours.keys()) | set(new_subject_hours.keys())
             for subject in all_subjects:
@@ -351,24 +491,12 @@ class ScheduleMonitor(BaseMonitor):
                         }
                     )
 
-            old_subject_periods = {}
-            for lesson, info in old_day_info:
-                subject = info["subject"]
-                if subject and info["period"] is not None:
-                    old_subject_periods.setdefault(subject, set()).add(info["period"])
-
-            new_subject_periods = {}
-            for lesson, info in new_day_info:
-                subject = info["subject"]
-                if subject and info["period"] is not None:
-                    new_subject_periods.setdefault(subject, set()).add(info["period"])
-
             for subject in all_subjects:
                 old_hours = old_subject_hours.get(subject, 0)
                 new_hours = new_subject_hours.get(subject, 0)
                 if old_hours == new_hours and old_hours > 0:
-                    old_periods = old_subject_periods.get(subject, set())
-                    new_periods = new_subject_periods.get(subject, set())
+                    old_periods = old_day["subject_periods"].get(subject, set())
+                    new_periods = new_day["subject_periods"].get(subject, set())
                     if old_periods != new_periods:
                         changes.append(
                             {
@@ -384,12 +512,8 @@ class ScheduleMonitor(BaseMonitor):
                 if subject not in old_subject_hours or subject not in new_subject_hours:
                     continue
 
-                old_subject_lessons = [
-                    info for _, info in old_day_info if info["subject"] == subject
-                ]
-                new_subject_lessons = [
-                    info for _, info in new_day_info if info["subject"] == subject
-                ]
+                old_subject_lessons = old_day["subject_lessons"][subject]
+                new_subject_lessons = new_day["subject_lessons"][subject]
 
                 old_teachers = set(
                     i["teacher"] for i in old_subject_lessons if i["teacher"]
@@ -426,45 +550,82 @@ class ScheduleMonitor(BaseMonitor):
                         }
                     )
 
-            old_by_period = {}
-            for l, info in old_day_info:
-                key = info["period"]
-                if key is not None:
-                    old_by_period.setdefault(key, []).append((l, info))
-
-            new_by_period = {}
-            for l, info in new_day_info:
-                key = info["period"]
-                if key is not None:
-                    new_by_period.setdefault(key, []).append((l, info))
+            old_by_period = old_day["by_period"]
+            new_by_period = new_day["by_period"]
 
             for period in set(old_by_period.keys()) & set(new_by_period.keys()):
-                old_lessons_in_period = old_by_period[period]
-                new_lessons_in_period = new_by_period[period]
-
-                for old_lesson, old_info in old_lessons_in_period:
-                    matching_new = [
-                        (nl, ninfo)
-                        for nl, ninfo in new_lessons_in_period
-                        if ninfo["subject"] == old_info["subject"]
-                    ]
-
-                    if not matching_new:
-                        for new_lesson, new_info in new_lessons_in_period:
-                            if new_info["subject"]:
-                                changes.append(
-                                    {
-                                        "day": day,
-                                        "period": period,
-                                        "type": "SUBJECT_CHANGE",
-                                        "old": old_info["subject"],
-                                        "new": new_info["subject"],
-                                    }
-                                )
-                                break
+                new_infos = new_by_period[period]
+                new_subjects = set(info["subject"] for info in new_infos)
+                replacement = next(
+                    (info for info in new_infos if info["subject"]), None
+                )
+
+                for old_info in old_by_period[period]:
+                    if old_info["subject"] in new_subjects or replacement is None:
+                        continue
+
+                    changes.append(
+                        {
+                            "day": day,
+                            "period": period,
+                            "type": "SUBJECT_CHANGE",
+                            "old": old_info["subject"],
+                            "new": replacement["subject"],
+                        }
+                    )
 
         return changes
 
+    def get_standard_schedule(self, access_token, week_start):
+        cache = self.store.load(self.username, "standard_schedule") or {}
+        entry = cache.get(week_start)
+
+        if entry is None:
+            logger.console_print("Generating standard schedule on-the-fly...", indent=4)
+            standard_schedule = self.find_best_standard_schedule(access_token)
+            if standard_schedule:
+                self.save_standard_schedule(week_start, standard_schedule)
+            return standard_schedule
+
+        ttl = config.get_standard_schedule_ttl(self.user_config)
+        if time.time() - entry["fetched_at"] > ttl:
+            logger.console_print(
+                "Using stale standard schedule, refreshing in background...", indent=4
+            )
+            self.refresh_standard_schedule_in_background(access_token, week_start)
+        else:
+            logger.console_print("Using cached standard schedule", indent=4)
+
+        return lessons_from_dicts(entry["lessons"])
+
+    def save_standard_schedule(self, week_start, lessons):
+        cache = self.store.load(self.username, "standard_schedule") or {}
+        cache = {week: entry for week, entry in cache.items() if week >= week_start}
+        cache[week_start] = {"fetched_at": time.time(), "lessons": to_dicts(lessons)}
+        self.store.save(self.username, "standard_schedule", cache)
+
+    def refresh_standard_schedule_in_background(self, access_token, week_start):
+        if self.refreshing_standard_schedule:
+            return
+        self.refreshing_standard_schedule = True
+
+        def worker():
+            try:
+                standard_schedule = self.find_best_standard_schedule(access_token)
+                if standard_schedule:
+                    self.save_standard_schedule(week_start, standard_schedule)
+                    logger.log_info(self.username, "Standard schedule refreshed")
+            except Exception as e:
+                logger.log_warning(
+                    self.username, "Background standard schedule refresh failed", e
+                )
+            finally:
+                self.refreshing_standard_schedule = False
+
+        threading.Thread(
+            target=worker, name=f"standard-schedule-{self.username}"
+        ).start()
+
     def find_best_standard_schedule(self, access_token):
         weeks_to_check = config.get_standard_schedule_weeks_ahead(self.user_config)
         logger.console_print(
@@ -473,41 +634,48 @@ class ScheduleMonitor(BaseMonitor):
         )
 
         now = datetime.now()
+        first_monday = now - timedelta(days=now.weekday())
+        last_saturday = first_monday + timedelta(weeks=weeks_to_check - 1, days=5)
+        start_str = first_monday.strftime("%Y-%m-%d")
+        end_str = last_saturday.strftime("%Y-%m-%d")
+
+        try:
+            raw_schedule = self.api.fetch_schedule_range(
+                access_token, start_str, end_str
+            )
+            processed = self.process_data(raw_schedule)
+        except Exception as e:
+            logger.log_warning(
+                self.username,
+                f"Failed to fetch schedule for {start_str} to {end_str}",
+                e,
+            )
+            return None
+
+        weeks = self.split_into_weeks(processed)
+        self.learn_weeks(weeks)
+
         best_week = None
         max_lesson_count = 0
         best_week_number = None
 
         for week_offset in range(weeks_to_check):
-            check_date = now + timedelta(weeks=week_offset)
-            monday = check_date - timedelta(days=check_date.weekday())
-            saturday = monday + timedelta(days=5)
+            monday = first_monday + timedelta(weeks=week_offset)
             week_number = monday.isocalendar()[1]
-
             monday_str = monday.strftime("%Y-%m-%d")
-            saturday_str = saturday.strftime("%Y-%m-%d")
 
-            try:
-                raw_schedule = self.api.fetch_schedule(
-                    access_token, monday_str, saturday_str
-                )
-                processed = self.process_data(raw_schedule)
-                lesson_count = len(processed)
-
-                logger.console_print(
-                    f"Week {week_number} ({monday_str}): {lesson_count} lessons",
-                    indent=6,
-                )
+            lessons = weeks.get(monday.date(), [])
+            lesson_count = len(lessons)
 
-                if lesson_count > max_lesson_count:
-                    max_lesson_count = lesson_count
-                    best_week = processed
-                    best_week_number = week_number
+            logger.console_print(
+                f"Week {week_number} ({monday_str}): {lesson_count} lessons",
+                indent=6,
+            )
 
-            except Exception as e:
-                logger.log_warning(
-                    self.username, f"Failed to fetch schedule for week {week_number}", e
-                )
-                continue
+            if lesson_count > max_lesson_count:
+                max_lesson_count = lesson_count
+                best_week = lessons
+                best_week_number = week_number
 
         if best_week:
             logger.console_success(
@@ -518,61 +686,150 @@ class ScheduleMonitor(BaseMonitor):
 
         return None
 
-    def notify_changes(self, changes, notifiers, rolled_over=False):
-        if not changes:
+    def learn_weeks(self, weeks):
+        if not config.get_learn_standard_schedule(self.user_config):
             return
 
-        current_schedule = self.load_cached_data()
-
-        current_schedule_display = {"lessons": []}
+        decay = config.get_standard_schedule_decay(self.user_config)
+        with get_template_lock(self.username):
+            template = self.store.load(self.username, "schedule_template") or {
+                "weeks": [],
+                "slots": {},
+            }
+
+            learned = []
+            for monday in sorted(weeks):
+                week = monday.isoformat()
+                if week in template["weeks"]:
+                    continue
 
-        if current_schedule:
-            for entry in current_schedule:
-                info = self.extract_lesson_info(entry)
+                self.learn_week(template, weeks[monday], decay)
+                template["weeks"] = (template["weeks"] + [week])[-TEMPLATE_WEEKS_KEPT:]
+                learned.append(week)
 
-                begin_datum_tijd = entry.get("beginDatumTijd", "")
-                eind_datum_tijd = entry.get("eindDatumTijd", "")
+            if learned:
+                self.store.save(self.username, "schedule_template", template)
+                logger.console_print(
+                    f"Learned standard schedule from {len(learned)} week(s)", indent=4
+                )
 
-                if begin_datum_tijd:
-                    try:
-                        dt_start = datetime.strptime(
-                            begin_datum_tijd, "%Y-%m-%dT%H:%M:%S.%f%z"
-                        )
-                        start_time = dt_start.strftime("%H:%M")
-                    except (ValueError, AttributeError):
-                        start_time = ""
-                else:
-                    start_time = ""
-
-                if eind_datum_tijd:
-                    try:
-                        dt_end = datetime.strptime(
-                            eind_datum_tijd, "%Y-%m-%dT%H:%M:%S.%f%z"
-                        )
-                        end_time = dt_end.strftime("%H:%M")
-                    except (ValueError, AttributeError):
-                        end_time = ""
-                else:
-                    end_time = ""
-
-                current_schedule_display["lessons"].append(
-                    {
-                        "day": info["day"],
-                        "period": info["period"],
-                        "period_end": entry.get("eindLesuur"),
-                        "subject": info["subject"],
-                        "teacher": info["teacher"],
-                        "location": info["location"],
-                        "start_time": start_time,
-                        "end_time": end_time,
-                    }
+    def learn_week(self, template, lessons, decay):
+        observed = {}
+        for lesson in lessons:
+            info = self.extract_lesson_info(lesson)
+            if info["period"] is None:
+                continue
+            slot = f"{info['day']}:{info['period']}"
+            observed.setdefault(slot, []).append((info, lesson))
+
+        slots = template["slots"]
+        for slot in set(slots) | set(observed):
+            candidates = slots.setdefault(slot, {})
+            for candidate in candidates.values():
+                candidate["weight"] *= decay
+
+            entries = observed.get(slot, [])
+            key = "|".join(
+                sorted(
+                    f"{info['subject']}/{info['teacher']}/{info['location']}"
+                    for info, _ in entries
                 )
+            )
+            candidate = candidates.setdefault(key, {"weight": 0})
+            candidate["weight"] += 1
+            candidate["lessons"] = to_dicts(lesson for _, lesson in entries)
+
+            for key in [
+                k for k, c in candidates.items() if c["weight"] < TEMPLATE_MIN_WEIGHT
+            ]:
+                del candidates[key]
+
+    def get_learned_schedule(self):
+        if not config.get_learn_standard_schedule(self.user_config):
+            return None
+
+        template = self.store.load(self.username, "schedule_template")
+        if not template or len(template["weeks"]) < TEMPLATE_MIN_WEEKS:
+            return None
+
+        lessons = []
+        for candidates in template["slots"].values():
+            best = max(candidates.values(), key=lambda c: c["weight"])
+            lessons.extend(lessons_from_dicts(best["lessons"]))
 
+        logger.console_print(
+            f"Using learned standard schedule ({len(template['weeks'])} weeks observed)",
+            indent=4,
+        )
+        return lessons
+
+    def split_into_weeks(self, lessons):
+        weeks = {}
+        for lesson in lessons:
+            try:
+                dt = timestamps.parse(lesson.get("beginDatumTijd", ""))
+            except (ValueError, TypeError):
+                continue
+
+            if dt.weekday() > 5:
+                continue
+
+            monday = dt.date() - timedelta(days=dt.weekday())
+            weeks.setdefault(monday, []).append(lesson)
+        return weeks
+
+    def notify_changes(self, changes, notifiers):
+        if not changes:
+            return
+
+        current_schedule_display = self.get_current_schedule_display()
         for notifier in notifiers:
             notifier.send_schedule_notification(
                 self.username,
                 self.user_config,
                 changes,
                 current_schedule_display,
-                rolled_over,
+                self.rolled_over,
+            )
+
+    async def anotify_changes(self, changes, notifiers):
+        if not changes:
+            return
+
+        current_schedule_display = await asyncio.to_thread(
+            self.get_current_schedule_display
+        )
+        for notifier in notifiers:
+            await notifier.send_schedule_notification(
+                self.username,
+                self.user_config,
+                changes,
+                current_schedule_display,
+                self.rolled_over,
             )
+
+    def get_current_schedule_display(self):
+        index = self.lesson_index
+        if index is None:
+            lessons = self.current_lessons
+            if lessons is None:
+                lessons = self.load_cached_data() or []
+            index = self.build_lesson_index(lessons)
+
+        current_schedule_display = {"lessons": []}
+
+        for entry, info in index["lessons"]:
+            current_schedule_display["lessons"].append(
+                {
+                    "day": info["day"],
+                    "period": info["period"],
+                    "period_end": entry.get("eindLesuur"),
+                    "subject": info["subject"],
+                    "teacher": info["teacher"],
+                    "location": info["location"],
+                    "start_time": info["start_time"],
+                    "end_time": timestamps.format_time(entry.get("eindDatumTijd")),
+                }
+            )
+
+        return current_schedule_display
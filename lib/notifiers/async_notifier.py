@@ -0,0 +1,28 @@
+import asyncio
+
+
+class AsyncNotifier:
+    def __init__(self, notifier, limiter):
+        self.notifier = notifier
+        self.limiter = limiter
+
+    async def call(self, func, *args):
+        async with self.limiter:
+            return await asyncio.to_thread(func, *args)
+
+    async def send_grade_notification(self, username, user_config, change):
+        await self.call(
+            self.notifier.send_grade_notification, username, user_config, change
+        )
+
+    async def send_schedule_notification(
+        self, username, user_config, changes, current_schedule, rolled_over=False
+    ):
+        await self.call(
+            self.notifier.send_schedule_notification,
+            username,
+            user_config,
+            changes,
+            current_schedule,
+            rolled_over,
+        )
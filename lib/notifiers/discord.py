@@ -18,8 +18,7 @@ class DiscordNotifier:
 
         if change_type == "NEW_HERKANSING":
             grade = change["grade"]
-            additional = grade.get("additionalObjects", {})
-            subject = additional.get("vaknaam", "")
+            subject = grade.get("vaknaam", "")
             test_name = grade.get("omschrijving", "onbekend")
 
             original_result = change.get("original_result", "?")
@@ -108,9 +107,8 @@ class DiscordNotifier:
 
         elif change_type == "NEW":
             grade = change["grade"]
-            additional = grade.get("additionalObjects", {})
             grade_value = grade.get("formattedResultaat", "") or grade.get("label", "")
-            subject = additional.get("vaknaam", "")
+            subject = grade.get("vaknaam", "")
             test_name = grade.get("omschrijving", "onbekend")
 
             try:
@@ -205,8 +203,7 @@ class DiscordNotifier:
             new_grade = change["new_grade"]
             grade_changes = change.get("changes", {})
 
-            additional = new_grade.get("additionalObjects", {})
-            subject = additional.get("vaknaam", "")
+            subject = new_grade.get("vaknaam", "")
             test_name = new_grade.get("omschrijving", "Onbekend")
 
             changes_list = []
@@ -357,9 +354,8 @@ class DiscordNotifier:
 
         elif change_type == "REMOVED":
             grade = change["grade"]
-            additional = grade.get("additionalObjects", {})
             grade_value = grade.get("formattedResultaat", "")
-            subject = additional.get("vaknaam", "")
+            subject = grade.get("vaknaam", "")
             test_name = grade.get("omschrijving", "onbekend")
 
             color = config.get_discord_grades_color_low(user_config)
@@ -458,7 +454,7 @@ class DiscordNotifier:
                     "footer": {"text": "SomPlus"},
                 }
             )
-            affected_days = set(c["day"] for c in changes)
+            affected_days = set(c["day"] for c in changes if "week" not in c)
         else:
             if today in lessons_by_day:
                 today_schedule = self.format_day_schedule(lessons_by_day[today])
@@ -470,7 +466,9 @@ class DiscordNotifier:
                         "footer": {"text": "SomPlus"},
                     }
                 )
-            affected_days = set(c["day"] for c in changes if c["day"] > today)
+            affected_days = set(
+                c["day"] for c in changes if c["day"] > today and "week" not in c
+            )
 
         if affected_days:
             day_names = ["Ma", "Di", "Wo", "Do", "Vr"]
@@ -553,6 +551,8 @@ class DiscordNotifier:
 
         for change in changes:
             day_name = day_names[change["day"]]
+            if "week" in change:
+                day_name = f"{day_name} (week {change['week']})"
 
             if change["type"] == "UITVAL":
                 lines.append(f"**{day_name}**: uitval **{change['subject']}**")
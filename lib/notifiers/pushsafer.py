@@ -16,8 +16,7 @@ class PushSaferNotifier:
 
         if change_type == "NEW_HERKANSING":
             grade = change["grade"]
-            additional = grade.get("additionalObjects", {})
-            subject = additional.get("vaknaam", "")
+            subject = grade.get("vaknaam", "")
             test_name = grade.get("omschrijving", "")
 
             original_result = change.get("original_result", "?")
@@ -48,9 +47,8 @@ class PushSaferNotifier:
 
         elif change_type == "NEW":
             grade = change["grade"]
-            additional = grade.get("additionalObjects", {})
             grade_value = grade.get("formattedResultaat", "") or grade.get("label", "")
-            subject = additional.get("vaknaam", "")
+            subject = grade.get("vaknaam", "")
             test_name = grade.get("omschrijving", "")
 
             try:
@@ -102,8 +100,7 @@ class PushSaferNotifier:
             new_grade = change["new_grade"]
             grade_changes = change.get("changes", {})
 
-            additional = new_grade.get("additionalObjects", {})
-            subject = additional.get("vaknaam", "")
+            subject = new_grade.get("vaknaam", "")
             test_name = new_grade.get("omschrijving", "")
 
             changes_list = []
@@ -177,9 +174,8 @@ class PushSaferNotifier:
 
         elif change_type == "REMOVED":
             grade = change["grade"]
-            additional = grade.get("additionalObjects", {})
             grade_value = grade.get("formattedResultaat", "")
-            subject = additional.get("vaknaam", "")
+            subject = grade.get("vaknaam", "")
             test_name = grade.get("omschrijving", "")
 
             sound = config.get_pushsafer_grades_sound_low(user_config)
@@ -304,6 +300,8 @@ class PushSaferNotifier:
         for change in changes:
             day = change["day"]
             day_name = day_names_short[day]
+            if "week" in change:
+                day_name = f"{day_name} wk{change['week']}"
 
             if change["type"] == "UITVAL":
                 change_texts.append(f"{day_name}: {change['subject']} uitval")
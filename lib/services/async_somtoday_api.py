@@ -0,0 +1,11 @@
+import asyncio
+
+
+class AsyncSomTodayAPI:
+    def __init__(self, api, limiter):
+        self.api = api
+        self.limiter = limiter
+
+    async def call(self, func, *args):
+        async with self.limiter:
+            return await asyncio.to_thread(func, *args)
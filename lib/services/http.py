@@ -0,0 +1,55 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Connection": "keep-alive",
+    "User-Agent": "SomPlus",
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def create_session(pool_size=10, pool_connections=4, headers=None):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def get_session(pool_size=10, pool_connections=4):
+    key = (pool_size, pool_connections)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = create_session(pool_size, pool_connections)
+            _sessions[key] = session
+        return session
+
+
+def get_pool_stats(session):
+    stats = {}
+
+    adapters = {id(a): a for a in session.adapters.values()}.values()
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            host = f"{pool.scheme}://{pool.host}"
+            entry = stats.setdefault(host, {"requests": 0, "new": 0, "reused": 0})
+            entry["requests"] += pool.num_requests
+            entry["new"] += pool.num_connections
+            entry["reused"] += max(pool.num_requests - pool.num_connections, 0)
+
+    return stats
@@ -0,0 +1,122 @@
+class Record:
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+
+def project(item, schema):
+    values = {}
+    for name, path in schema.items():
+        value = item
+        for step in path:
+            try:
+                value = value[step]
+            except (KeyError, IndexError, TypeError):
+                value = None
+                break
+        values[name] = value
+    return values
+
+
+class Lesson(Record):
+    schema = {
+        "beginDatumTijd": ("beginDatumTijd",),
+        "eindDatumTijd": ("eindDatumTijd",),
+        "beginLesuur": ("beginLesuur",),
+        "eindLesuur": ("eindLesuur",),
+        "vak": ("vakken", 0, "afkorting"),
+        "docent": ("docenten", 0, "afkorting"),
+        "locatie": ("locatie",),
+        "titel": ("titel",),
+    }
+    __slots__ = tuple(schema)
+
+    @classmethod
+    def from_api(cls, item):
+        return cls(**project(item, cls.schema))
+
+    @classmethod
+    def from_dict(cls, data):
+        if "vakken" in data or "docenten" in data:
+            return cls.from_api(data)
+        return cls(**data)
+
+
+class Grade(Record):
+    schema = {
+        "type": ("type",),
+        "kolomId": ("kolomId",),
+        "vaknaam": ("additionalObjects", "vaknaam"),
+        "omschrijving": ("omschrijving",),
+        "toetssoort": ("toetssoort",),
+        "periode": ("periode",),
+        "weging": ("weging",),
+        "examenWeging": ("examenWeging",),
+        "cijfer": ("cijfer",),
+        "label": ("label",),
+        "isLabel": ("isLabel",),
+        "isVoldoende": ("isVoldoende",),
+        "formattedResultaat": ("formattedResultaat",),
+        "formattedEerstePoging": ("formattedEerstePoging",),
+        "cijferHerkansing1": ("cijferHerkansing1",),
+        "formattedHerkansing1": ("formattedHerkansing1",),
+        "herkansing": ("herkansing",),
+        "teltNietmee": ("teltNietmee",),
+        "vrijstelling": ("vrijstelling",),
+        "datumInvoerEerstePoging": ("datumInvoerEerstePoging",),
+    }
+    __slots__ = tuple(schema) + ("contentHash",)
+
+    @classmethod
+    def from_api(cls, item):
+        return cls(**project(item, cls.schema))
+
+    @classmethod
+    def from_dict(cls, data):
+        if "additionalObjects" in data:
+            grade = cls.from_api(data)
+            grade.contentHash = data.get("contentHash")
+            return grade
+        return cls(**data)
+
+
+def to_dicts(records):
+    return [record.to_dict() for record in records]
+
+
+def lessons_from_dicts(items):
+    return [Lesson.from_dict(item) for item in items]
+
+
+def encode(record):
+    if isinstance(record, Record):
+        return record.to_dict()
+    raise TypeError(f"{type(record).__name__} is not JSON serializable")
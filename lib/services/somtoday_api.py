@@ -1,13 +1,66 @@
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from datetime import date, timedelta
+from lib.services import http
+from lib.services.records import Grade, Lesson
+
+
+def get_additional_objects(schema):
+    return sorted(
+        {path[1] for path in schema.values() if path[0] == "additionalObjects"}
+    )
+
+
+GRADE_PARAMS = {
+    "type": [
+        "Toetskolom",
+        "DeeltoetsKolom",
+        "Werkstukcijferkolom",
+        "Advieskolom",
+    ],
+    "additional": get_additional_objects(Grade.schema),
+    "sort": "desc-geldendResultaatCijferInvoer",
+}
+
+
+def parse_content_range_total(content_range):
+    if not content_range or "/" not in content_range:
+        return None
+
+    total = content_range.rsplit("/", 1)[1].strip()
+    if not total.isdigit():
+        return None
+
+    return int(total)
 
 
 class SomTodayAPI:
-    def __init__(self, api_base, oauth_url, client_id, pagination_size=100, timeout=30):
+    def __init__(
+        self,
+        api_base,
+        oauth_url,
+        client_id,
+        pagination_size=100,
+        timeout=30,
+        pool_size=10,
+        session=None,
+        parallel_pagination=False,
+        pagination_workers=4,
+        schedule_range_weeks=8,
+    ):
         self.api_base = api_base
         self.oauth_url = oauth_url
         self.client_id = client_id
         self.pagination_size = pagination_size
         self.timeout = timeout
+        self.session = session or http.get_session(pool_size)
+        self.parallel_pagination = parallel_pagination
+        self.pagination_workers = pagination_workers
+        self.schedule_range_weeks = schedule_range_weeks
+
+    def get_pool_stats(self):
+        return http.get_pool_stats(self.session)
 
     def refresh_token(self, refresh_token):
         data = {
@@ -16,86 +69,164 @@ class SomTodayAPI:
             "client_id": self.client_id,
         }
 
-        response = requests.post(self.oauth_url, data=data, timeout=self.timeout)
+        response = self.session.post(self.oauth_url, data=data, timeout=self.timeout)
         response.raise_for_status()
 
         result = response.json()
         access_token = result["access_token"]
         new_refresh_token = result.get("refresh_token", refresh_token)
+        expires_in = result.get("expires_in", 0)
 
-        return access_token, new_refresh_token
+        return access_token, new_refresh_token, expires_in
 
-    def fetch_grades(self, access_token, leerling_id):
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-        }
-        params = {
-            "type": [
-                "Toetskolom",
-                "DeeltoetsKolom",
-                "Werkstukcijferkolom",
-                "Advieskolom",
-            ],
-            "additional": [
-                "vaknaam",
-                "resultaatkolom",
-                "naamalternatiefniveau",
-                "vakuuid",
-                "lichtinguuid",
-            ],
-            "sort": "desc-geldendResultaatCijferInvoer",
-        }
-
-        all_grades = []
+    def decode_items(self, response, record_type):
+        return [
+            record_type.from_api(item)
+            for item in response.json().get("items", [])
+            if isinstance(item, dict)
+        ]
 
-        endpoints = [
+    def get_grade_endpoints(self, leerling_id):
+        return [
             f"{self.api_base}/geldendvoortgangsdossierresultaten/leerling/{leerling_id}",
             f"{self.api_base}/geldendexamendossierresultaten/leerling/{leerling_id}",
         ]
 
+    def iter_grade_pages(self, access_token, leerling_id):
+        headers = {"Authorization": f"Bearer {access_token}"}
+        endpoints = self.get_grade_endpoints(leerling_id)
+
+        if self.parallel_pagination:
+            yield from self.iter_grade_pages_parallel(headers, endpoints)
+            return
+
         for url in endpoints:
-            range_start = 0
-            range_size = self.pagination_size
+            yield from self.iter_pages(url, headers)
+
+    def iter_grade_dossiers(self, access_token, leerling_id):
+        headers = {"Authorization": f"Bearer {access_token}"}
+        for url in self.get_grade_endpoints(leerling_id):
+            yield self.iter_pages(url, headers)
+
+    def probe_grades(self, access_token, leerling_id):
+        headers = {"Authorization": f"Bearer {access_token}"}
+        probes = []
+        for url in self.get_grade_endpoints(leerling_id):
+            batch, total = self.fetch_grade_page(url, headers, 0, size=1)
+            probes.append((batch[0] if batch else None, total))
+        return probes
+
+    def fetch_grade_page(self, url, headers, range_start, size=None):
+        range_end = range_start + (size or self.pagination_size) - 1
+        page_headers = dict(headers)
+        page_headers["Range"] = f"items={range_start}-{range_end}"
+
+        response = self.session.get(
+            url, headers=page_headers, params=GRADE_PARAMS, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+        batch = self.decode_items(response, Grade)
+        total = parse_content_range_total(response.headers.get("Content-Range"))
 
-            while True:
-                headers["Range"] = f"items={range_start}-{range_start + range_size - 1}"
-                response = requests.get(url, headers=headers, params=params, timeout=self.timeout)
-                response.raise_for_status()
+        return batch, total
 
-                batch = response.json().get("items", [])
-                if not batch:
-                    break
+    def fetch_grade_batch(self, url, headers, range_start):
+        batch, _ = self.fetch_grade_page(url, headers, range_start)
+        return batch
 
-                all_grades.extend(batch)
-                range_start += range_size
+    def iter_pages(self, url, headers, range_start=0):
+        while True:
+            batch = self.fetch_grade_batch(url, headers, range_start)
+            if not batch:
+                break
 
+            yield batch
+            range_start += self.pagination_size
+
+            if len(batch) < self.pagination_size:
+                break
+
+    def iter_grade_pages_parallel(self, headers, endpoints):
+        range_size = self.pagination_size
+
+        with ThreadPoolExecutor(max_workers=self.pagination_workers) as executor:
+            first_pages = list(
+                executor.map(
+                    lambda url: self.fetch_grade_page(url, headers, 0), endpoints
+                )
+            )
+
+            pending = []
+            for index, (url, (batch, total)) in enumerate(zip(endpoints, first_pages)):
+                if len(batch) == range_size and total is not None:
+                    pending.extend(
+                        (index, url, range_start)
+                        for range_start in range(range_size, total, range_size)
+                    )
+
+            ranges = iter(pending)
+            futures = deque(
+                self.submit_ranges(executor, headers, ranges, self.pagination_workers)
+            )
+
+            for index, (url, (batch, total)) in enumerate(zip(endpoints, first_pages)):
+                yield batch
                 if len(batch) < range_size:
-                    break
+                    continue
+
+                if total is None:
+                    yield from self.iter_pages(url, headers, range_size)
+                    continue
+
+                while futures and futures[0][0] == index:
+                    batch = futures.popleft()[1].result()
+                    futures.extend(self.submit_ranges(executor, headers, ranges, 1))
+                    yield batch
 
-        return all_grades
+    def submit_ranges(self, executor, headers, ranges, count):
+        return [
+            (index, executor.submit(self.fetch_grade_batch, url, headers, range_start))
+            for index, url, range_start in islice(ranges, count)
+        ]
 
     def fetch_schedule(self, access_token, start_date, end_date):
         url = f"{self.api_base}/afspraken"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-        }
+        headers = {"Authorization": f"Bearer {access_token}"}
         params = {"begindatum": start_date, "einddatum": end_date}
 
-        response = requests.get(url, headers=headers, params=params, timeout=self.timeout)
+        response = self.session.get(
+            url, headers=headers, params=params, timeout=self.timeout
+        )
         response.raise_for_status()
 
-        return response.json().get("items", [])
+        return self.decode_items(response, Lesson)
+
+    def fetch_schedule_range(self, access_token, start_date, end_date):
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        chunk = timedelta(weeks=max(self.schedule_range_weeks, 1))
+
+        ranges = []
+        while start <= end:
+            chunk_end = min(start + chunk - timedelta(days=1), end)
+            ranges.append((start.isoformat(), chunk_end.isoformat()))
+            start = chunk_end + timedelta(days=1)
+
+        if len(ranges) == 1:
+            return self.fetch_schedule(access_token, *ranges[0])
+
+        with ThreadPoolExecutor(max_workers=self.pagination_workers) as executor:
+            batches = executor.map(
+                lambda r: self.fetch_schedule(access_token, *r), ranges
+            )
+            return [lesson for batch in batches for lesson in batch]
 
     def fetch_subjects(self, access_token):
         url = f"{self.api_base}/vakken"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-        }
+        headers = {"Authorization": f"Bearer {access_token}"}
 
-        response = requests.get(url, headers=headers, timeout=self.timeout)
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
         response.raise_for_status()
 
         return response.json().get("items", [])
@@ -0,0 +1,376 @@
+import os
+import json
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from lib.utils import config, metrics
+
+_stores = {}
+_stores_lock = threading.Lock()
+_config_lock = threading.Lock()
+saved_mtimes = {}
+
+
+def save_user_config(username, user_config, config_dir):
+    users_dir = os.path.join(config_dir, "users")
+    os.makedirs(users_dir, exist_ok=True)
+    path = os.path.join(users_dir, f"{username}.json")
+    with _config_lock:
+        with open(path, "w") as f:
+            json.dump(user_config, f, indent=2)
+        saved_mtimes[path] = os.stat(path).st_mtime_ns
+
+
+def write_file_atomic(path, content):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def dump_compact(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+def grade_key(grade):
+    kolom_id = grade.get("kolomId")
+    return (
+        grade.get("vaknaam", ""),
+        grade.get("omschrijving", ""),
+        "" if kolom_id is None else str(kolom_id),
+    )
+
+
+def lesson_key(lesson):
+    return (lesson.get("beginDatumTijd", "")[:10], lesson.get("beginLesuur"))
+
+
+TABLES = {
+    "grades": ("grades", ("subject", "omschrijving", "kolom_id"), grade_key),
+    "schedule": ("lessons", ("date", "period"), lesson_key),
+}
+
+
+class JsonStateStore:
+    def __init__(self, data_dir, config_dir):
+        self.data_dir = data_dir
+        self.config_dir = config_dir
+        self.file_digests = {}
+        self.lock = threading.Lock()
+
+    def get_path(self, username, filename):
+        user_dir = os.path.join(self.data_dir, username)
+        os.makedirs(user_dir, exist_ok=True)
+        return os.path.join(user_dir, filename)
+
+    def load(self, username, collection):
+        path = self.get_path(username, f"{collection}.json")
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r") as f:
+            content = f.read()
+        with self.lock:
+            self.file_digests[path] = hashlib.sha1(content.encode()).hexdigest()
+        return json.loads(content)
+
+    def save(self, username, collection, data):
+        path = self.get_path(username, f"{collection}.json")
+        content = dump_compact(data)
+        digest = hashlib.sha1(content.encode()).hexdigest()
+        with self.lock:
+            if self.file_digests.get(path) == digest:
+                metrics.increment("cache_writes_skipped")
+                return
+
+        write_file_atomic(path, content)
+        with self.lock:
+            self.file_digests[path] = digest
+        metrics.increment("cache_writes")
+        metrics.increment("cache_bytes_written", len(content.encode()))
+
+    def get_value(self, username, key, default=None):
+        state = self.load(username, "state") or {}
+        return state.get(key, default)
+
+    def set_value(self, username, key, value):
+        state = self.load(username, "state") or {}
+        state[key] = value
+        self.save(username, "state", state)
+
+    def append_log(self, username, name, entries):
+        path = self.get_path(username, f"{name}.log")
+        content = "".join(dump_compact(entry) + "\n" for entry in entries).encode()
+        with open(path, "ab") as f:
+            f.write(content)
+            position = f.tell()
+        metrics.increment("log_bytes_written", len(content))
+        return position
+
+    def read_log(self, username, name, position=None):
+        path = self.get_path(username, f"{name}.log")
+        position = position or 0
+        if not os.path.exists(path):
+            return [], position
+
+        with open(path, "rb") as f:
+            f.seek(position)
+            content = f.read()
+
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            with open(path, "r+b") as f:
+                f.truncate(position + complete)
+
+        entries = [json.loads(line) for line in content[:complete].splitlines()]
+        return entries, position + complete
+
+    def get_refresh_token(self, username, user_config):
+        return config.get(user_config, "auth.refresh_token")
+
+    def set_refresh_token(self, username, user_config, refresh_token):
+        if refresh_token == config.get(user_config, "auth.refresh_token"):
+            return False
+
+        user_config["auth"]["refresh_token"] = refresh_token
+        save_user_config(username, user_config, self.config_dir)
+        return True
+
+    def set_last_successful_run(self, username, user_config, timestamp):
+        if not user_config.get("state"):
+            user_config["state"] = {}
+
+        user_config["state"]["last_successful_run"] = timestamp
+        save_user_config(username, user_config, self.config_dir)
+
+
+class SqliteStateStore:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self.lock, self.conn:
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS grades (
+                    username TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    omschrijving TEXT NOT NULL,
+                    kolom_id TEXT NOT NULL,
+                    slot INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (username, subject, omschrijving, kolom_id, slot)
+                );
+                CREATE TABLE IF NOT EXISTS lessons (
+                    username TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    period INTEGER,
+                    slot INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (username, date, period, slot)
+                );
+                CREATE TABLE IF NOT EXISTS documents (
+                    username TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (username, name)
+                );
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL,
+                    log TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS events_by_log ON events (username, log, id);
+                CREATE TABLE IF NOT EXISTS user_state (
+                    username TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (username, key)
+                );
+                """
+            )
+
+    def load(self, username, collection):
+        if collection not in TABLES:
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT data FROM documents WHERE username = ? AND name = ?",
+                    (username, collection),
+                ).fetchone()
+            return None if row is None else json.loads(row[0])
+
+        order = self.get_value(username, f"{collection}.order")
+        if order is None:
+            return None
+
+        table, key_columns, _ = TABLES[collection]
+        column_list = ", ".join(key_columns + ("slot",))
+        with self.lock:
+            rows = {
+                tuple(row[:-1]): row[-1]
+                for row in self.conn.execute(
+                    f"SELECT {column_list}, data FROM {table} WHERE username = ?",
+                    (username,),
+                )
+            }
+        return [json.loads(rows[tuple(key)]) for key in order if tuple(key) in rows]
+
+    def save(self, username, collection, data):
+        if collection not in TABLES:
+            content = dump_compact(data)
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO documents (username, name, data) "
+                    "VALUES (?, ?, ?)",
+                    (username, collection, content),
+                )
+            metrics.increment("state_rows_written")
+            return
+
+        table, key_columns, key_func = TABLES[collection]
+        rows = {}
+        slots = {}
+        for item in data:
+            key = key_func(item)
+            slot = slots.get(key, 0)
+            slots[key] = slot + 1
+            rows[key + (slot,)] = dump_compact(item)
+
+        columns = key_columns + ("slot",)
+        column_list = ", ".join(columns)
+        where = " AND ".join(f"{column} = ?" for column in columns)
+        order = dump_compact(list(rows))
+
+        with self.lock, self.conn:
+            existing = {
+                tuple(row[:-1]): row[-1]
+                for row in self.conn.execute(
+                    f"SELECT {column_list}, data FROM {table} WHERE username = ?",
+                    (username,),
+                )
+            }
+
+            upserts = [
+                (username,) + key + (value,)
+                for key, value in rows.items()
+                if existing.get(key) != value
+            ]
+            deletes = [(username,) + key for key in existing.keys() - rows.keys()]
+
+            if upserts:
+                placeholders = ", ".join("?" for _ in range(len(columns) + 2))
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} "
+                    f"(username, {column_list}, data) VALUES ({placeholders})",
+                    upserts,
+                )
+            if deletes:
+                self.conn.executemany(
+                    f"DELETE FROM {table} WHERE username = ? AND {where}", deletes
+                )
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO user_state (username, key, value) "
+                "VALUES (?, ?, ?)",
+                (username, f"{collection}.order", order),
+            )
+
+        if upserts or deletes:
+            metrics.increment("state_rows_written", len(upserts) + len(deletes))
+        else:
+            metrics.increment("cache_writes_skipped")
+
+    def get_value(self, username, key, default=None):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM user_state WHERE username = ? AND key = ?",
+                (username, key),
+            ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_value(self, username, key, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO user_state (username, key, value) "
+                "VALUES (?, ?, ?)",
+                (username, key, dump_compact(value)),
+            )
+
+    def append_log(self, username, name, entries):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO events (username, log, data) VALUES (?, ?, ?)",
+                [(username, name, dump_compact(entry)) for entry in entries],
+            )
+            position = self.conn.execute(
+                "SELECT MAX(id) FROM events WHERE username = ? AND log = ?",
+                (username, name),
+            ).fetchone()[0]
+        metrics.increment("state_rows_written", len(entries))
+        return position
+
+    def read_log(self, username, name, position=None):
+        position = position or 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, data FROM events WHERE username = ? AND log = ? AND id > ? "
+                "ORDER BY id",
+                (username, name, position),
+            ).fetchall()
+
+        if not rows:
+            return [], position
+        return [json.loads(row[1]) for row in rows], rows[-1][0]
+
+    def get_refresh_token(self, username, user_config):
+        config_token = config.get(user_config, "auth.refresh_token")
+        if self.get_value(username, "config_refresh_token") != config_token:
+            return config_token
+
+        return self.get_value(username, "refresh_token", config_token)
+
+    def set_refresh_token(self, username, user_config, refresh_token):
+        if refresh_token == self.get_value(username, "refresh_token"):
+            return False
+
+        config_token = config.get(user_config, "auth.refresh_token")
+        self.set_value(username, "config_refresh_token", config_token)
+        self.set_value(username, "refresh_token", refresh_token)
+        return True
+
+    def set_last_successful_run(self, username, user_config, timestamp):
+        self.set_value(username, "last_successful_run", timestamp)
+
+
+def get_state_store(app_config):
+    backend = config.get(app_config, "storage.backend", "json")
+    data_dir = app_config["paths"]["data_dir"]
+
+    if backend == "sqlite":
+        path = config.get(app_config, "storage.sqlite_path", "data/state.db")
+        path = os.path.join(os.path.dirname(data_dir), path)
+        key = ("sqlite", path)
+    else:
+        key = ("json", data_dir)
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if backend == "sqlite":
+                store = SqliteStateStore(path)
+            else:
+                store = JsonStateStore(data_dir, app_config["paths"]["config_dir"])
+            _stores[key] = store
+        return store
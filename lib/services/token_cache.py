@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+from lib.utils import logger
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TokenCache:
+    def __init__(self, data_dir, expiry_margin=60, refresh_ahead=300):
+        self.data_dir = data_dir
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        self.tokens = {}
+        self.locks = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def get_access_token(self, username, refresh_token, api, on_refresh):
+        entry = self.get_entry(username)
+        now = time.time()
+
+        if entry and entry["expires_at"] - self.expiry_margin > now:
+            if entry["expires_at"] - self.refresh_ahead <= now:
+                self.refresh_in_background(username, refresh_token, api, on_refresh)
+            return entry["access_token"]
+
+        with self.get_user_lock(username):
+            entry = self.get_entry(username)
+            if entry and entry["expires_at"] - self.expiry_margin > time.time():
+                return entry["access_token"]
+
+            return self.refresh(username, refresh_token, api, on_refresh)
+
+    def refresh(self, username, refresh_token, api, on_refresh):
+        access_token, new_refresh_token, expires_in = api.refresh_token(refresh_token)
+        on_refresh(new_refresh_token)
+
+        entry = {"access_token": access_token, "expires_at": time.time() + expires_in}
+        with self.lock:
+            self.tokens[username] = entry
+        self.save_entry(username, entry)
+
+        return access_token
+
+    def refresh_in_background(self, username, refresh_token, api, on_refresh):
+        with self.lock:
+            if username in self.refreshing:
+                return
+            self.refreshing.add(username)
+
+        def worker():
+            try:
+                with self.get_user_lock(username):
+                    entry = self.get_entry(username)
+                    if entry and entry["expires_at"] - self.refresh_ahead > time.time():
+                        return
+                    self.refresh(username, refresh_token, api, on_refresh)
+                logger.log_info(username, "Access token refreshed ahead of expiry")
+            except Exception as e:
+                logger.log_warning(username, "Background token refresh failed", e)
+            finally:
+                with self.lock:
+                    self.refreshing.discard(username)
+
+        threading.Thread(target=worker, name=f"token-refresh-{username}").start()
+
+    def invalidate(self, username):
+        with self.lock:
+            self.tokens.pop(username, None)
+
+        path = self.get_path(username)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def get_user_lock(self, username):
+        with self.lock:
+            return self.locks.setdefault(username, threading.Lock())
+
+    def get_entry(self, username):
+        with self.lock:
+            entry = self.tokens.get(username)
+        if entry is not None:
+            return entry
+
+        path = self.get_path(username)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return None
+
+        with self.lock:
+            self.tokens[username] = entry
+        return entry
+
+    def save_entry(self, username, entry):
+        user_dir = os.path.join(self.data_dir, username)
+        os.makedirs(user_dir, exist_ok=True)
+        with open(self.get_path(username), "w") as f:
+            json.dump(entry, f)
+
+    def get_path(self, username):
+        return os.path.join(self.data_dir, username, "token.json")
+
+
+def get_token_cache(data_dir, expiry_margin=60, refresh_ahead=300):
+    with _caches_lock:
+        cache = _caches.get(data_dir)
+        if cache is None:
+            cache = TokenCache(data_dir, expiry_margin, refresh_ahead)
+            _caches[data_dir] = cache
+        cache.expiry_margin = expiry_margin
+        cache.refresh_ahead = refresh_ahead
+        return cache
@@ -43,6 +43,46 @@ def get_standard_schedule_weeks_ahead(user_config):
     return get(user_config, "monitoring.schedule.standard_schedule_weeks_ahead", 8)
 
 
+def get_standard_schedule_ttl(user_config):
+    return get(user_config, "monitoring.schedule.standard_schedule_ttl", 86400)
+
+
+def get_learn_standard_schedule(user_config):
+    return get(user_config, "monitoring.schedule.learn_standard_schedule", True)
+
+
+def get_standard_schedule_decay(user_config):
+    return get(user_config, "monitoring.schedule.standard_schedule_decay", 0.8)
+
+
+def get_schedule_horizon_weeks(user_config):
+    return get(user_config, "monitoring.schedule.horizon_weeks", 1)
+
+
+def get_schedule_horizon_interval(user_config):
+    return get(user_config, "monitoring.schedule.horizon_interval", 3600)
+
+
+def get_schedule_fast_path(user_config):
+    return get(user_config, "monitoring.schedule.fast_path", False)
+
+
+def get_schedule_fast_path_hours(user_config):
+    return get(user_config, "monitoring.schedule.fast_path_hours", [8, 17])
+
+
+def get_schedule_fast_path_tomorrow(user_config):
+    return get(user_config, "monitoring.schedule.fast_path_tomorrow", False)
+
+
+def get_schedule_full_week_interval(user_config):
+    return get(user_config, "monitoring.schedule.full_week_interval", 900)
+
+
+def get_grade_log_compact_every(app_config):
+    return get(app_config, "storage.grade_log_compact_every", 50)
+
+
 def get_grades_enabled(user_config):
     return get(user_config, "monitoring.grades.enabled", True)
 
@@ -55,6 +95,18 @@ def get_grades_filters(user_config):
     )
 
 
+def get_grades_incremental_sync(user_config):
+    return get(user_config, "monitoring.grades.incremental_sync", False)
+
+
+def get_grades_full_sync_interval(user_config):
+    return get(user_config, "monitoring.grades.full_sync_interval", 86400)
+
+
+def get_grades_probe(user_config):
+    return get(user_config, "monitoring.grades.probe", False)
+
+
 def get_discord_grades_enabled(user_config):
     return get(user_config, "notifications.discord.grades.enabled", False)
 
@@ -1,5 +1,6 @@
 import os
 import json
+import threading
 from datetime import datetime, timedelta
 
 CRITICAL = "critical"
@@ -9,6 +10,7 @@ INFO = "info"
 
 log_dir = None
 error_tracking = {}
+_lock = threading.RLock()
 
 RED = "\033[91m"
 GREEN = "\033[92m"
@@ -39,17 +41,19 @@ def get_error_tracking_path():
 def load_error_tracking():
     global error_tracking
     path = get_error_tracking_path()
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            error_tracking = json.load(f)
-    else:
-        error_tracking = {}
+    with _lock:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                error_tracking = json.load(f)
+        else:
+            error_tracking = {}
 
 
 def save_error_tracking():
     path = get_error_tracking_path()
-    with open(path, "w") as f:
-        json.dump(error_tracking, f, indent=2)
+    with _lock:
+        with open(path, "w") as f:
+            json.dump(error_tracking, f, indent=2)
 
 
 def get_current_hour_key():
@@ -80,12 +84,15 @@ def _log(severity, username, message, exception=None):
         return
 
     log_line = f"{timestamp} | {username} | {severity_upper} | {detail}\n"
-    with open(get_daily_log_path(), "a") as f:
-        f.write(log_line)
+    with _lock:
+        with open(get_daily_log_path(), "a") as f:
+            f.write(log_line)
 
-    if severity not in (CRITICAL, ERROR):
-        return
+        if severity in (CRITICAL, ERROR):
+            track_error(username, message, exception, time_short)
 
+
+def track_error(username, message, exception, time_short):
     hour_key = get_current_hour_key()
     if hour_key not in error_tracking:
         error_tracking[hour_key] = {}
@@ -135,7 +142,8 @@ def get_previous_hour_errors():
     previous_hour = now - timedelta(hours=1)
     hour_key = previous_hour.strftime("%Y-%m-%dT%H:00:00")
 
-    errors = error_tracking.get(hour_key, {})
+    with _lock:
+        errors = dict(error_tracking.get(hour_key, {}))
     if errors:
         return errors, hour_key
 
@@ -155,9 +163,10 @@ def get_previous_hour_errors():
 
 
 def clear_hour_errors(hour_key):
-    if hour_key in error_tracking:
-        del error_tracking[hour_key]
-        save_error_tracking()
+    with _lock:
+        if hour_key in error_tracking:
+            del error_tracking[hour_key]
+            save_error_tracking()
 
     hour_date = hour_key[:10]
     today = datetime.now().strftime("%Y-%m-%d")
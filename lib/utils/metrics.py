@@ -0,0 +1,23 @@
+import threading
+
+_lock = threading.Lock()
+cycle_counters = {}
+total_counters = {}
+
+
+def increment(name, amount=1):
+    with _lock:
+        cycle_counters[name] = cycle_counters.get(name, 0) + amount
+        total_counters[name] = total_counters.get(name, 0) + amount
+
+
+def get_total(name):
+    with _lock:
+        return total_counters.get(name, 0)
+
+
+def end_cycle():
+    with _lock:
+        counters = dict(cycle_counters)
+        cycle_counters.clear()
+    return counters
@@ -0,0 +1,22 @@
+from datetime import datetime
+from functools import lru_cache
+
+SOMTODAY_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+
+@lru_cache(maxsize=4096)
+def parse(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, SOMTODAY_FORMAT)
+
+
+def format_time(value):
+    if not value:
+        return ""
+
+    try:
+        return parse(value).strftime("%H:%M")
+    except (ValueError, TypeError):
+        return ""
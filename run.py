@@ -1,12 +1,19 @@
 import os
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from lib.utils import logger, config
+from functools import partial
+from lib.utils import logger, config, metrics
 from lib.services.somtoday_api import SomTodayAPI
+from lib.services.async_somtoday_api import AsyncSomTodayAPI
+from lib.services.token_cache import get_token_cache
+from lib.services.state_store import get_state_store, saved_mtimes
 from lib.monitors.grade_monitor import GradeMonitor
 from lib.monitors.schedule_monitor import ScheduleMonitor
 from lib.notifiers.pushsafer import PushSaferNotifier
 from lib.notifiers.discord import DiscordNotifier
+from lib.notifiers.async_notifier import AsyncNotifier
 
 
 def load_json(path):
@@ -14,54 +21,86 @@ def load_json(path):
         return json.load(f)
 
 
-def save_json(path, data):
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+def create_token_cache(app_config):
+    return get_token_cache(
+        app_config["paths"]["data_dir"],
+        config.get(app_config, "somtoday.token_expiry_margin", 60),
+        config.get(app_config, "somtoday.token_refresh_ahead", 300),
+    )
 
 
-def save_user_config(username, config, config_dir):
-    users_dir = os.path.join(config_dir, "users")
-    os.makedirs(users_dir, exist_ok=True)
-    path = os.path.join(users_dir, f"{username}.json")
-    save_json(path, config)
+def start_user(username, user_config):
+    if not config.get(user_config, "enabled", True):
+        logger.log_info(username, "User disabled, skipping")
+        return False
 
+    logger.console_print(f"\n{'=' * 60}")
+    logger.console_info(f"Processing user: {username}")
+    logger.console_print(f"{'=' * 60}")
+    return True
 
-def load_all_user_configs(config_dir):
-    users_dir = os.path.join(config_dir, "users")
-    if not os.path.exists(users_dir):
-        return {}
 
-    user_configs = {}
-    for filename in os.listdir(users_dir):
-        if filename.endswith(".json"):
-            username = filename[:-5]
-            path = os.path.join(users_dir, filename)
-            user_configs[username] = load_json(path)
+def update_refresh_token(username, user_config, app_config, new_refresh_token):
+    logger.console_print("Refreshing authentication token...", indent=2)
+    store = get_state_store(app_config)
+    if store.set_refresh_token(username, user_config, new_refresh_token):
+        logger.console_print("Token updated and saved", indent=2)
 
-    return user_configs
+    logger.log_info(username, "Token refreshed successfully")
+
+
+def finish_user(username, user_config, app_config):
+    get_state_store(app_config).set_last_successful_run(
+        username, user_config, datetime.now().isoformat()
+    )
+    logger.console_success("User processing completed", indent=2)
 
 
 def process_user(username, user_config, app_config, api, monitors, notifiers):
-    if not config.get(user_config, "enabled", True):
-        logger.log_info(username, "User disabled, skipping")
+    if not start_user(username, user_config):
         return
 
-    logger.console_print(f"\n{'=' * 60}")
-    logger.console_info(f"Processing user: {username}")
-    logger.console_print(f"{'=' * 60}")
-
+    token_cache = create_token_cache(app_config)
+    on_refresh = partial(update_refresh_token, username, user_config, app_config)
     try:
-        refresh_token = config.get(user_config, "auth.refresh_token")
-        logger.console_print("Refreshing authentication token...", indent=2)
-        access_token, new_refresh_token = api.refresh_token(refresh_token)
+        refresh_token = get_state_store(app_config).get_refresh_token(
+            username, user_config
+        )
+        access_token = token_cache.get_access_token(
+            username, refresh_token, api, on_refresh
+        )
+    except Exception as e:
+        logger.log_critical(username, "Token refresh failed", e)
+        return
+
+    for monitor in monitors:
+        try:
+            logger.console_print(f"\nRunning {monitor.__class__.__name__}...", indent=2)
+            monitor.run(access_token, notifiers)
+        except Exception as e:
+            logger.log_critical(username, f"{monitor.__class__.__name__} failed", e)
+
+    if any(monitor.auth_failed for monitor in monitors):
+        token_cache.invalidate(username)
+
+    finish_user(username, user_config, app_config)
 
-        if new_refresh_token != refresh_token:
-            user_config["auth"]["refresh_token"] = new_refresh_token
-            save_user_config(username, user_config, app_config["paths"]["config_dir"])
-            logger.console_print("Token updated and saved", indent=2)
 
-        logger.log_info(username, "Token refreshed successfully")
+async def process_user_async(
+    username, user_config, app_config, api, monitors, notifiers
+):
+    if not start_user(username, user_config):
+        return
 
+    token_cache = create_token_cache(app_config)
+    on_refresh = partial(update_refresh_token, username, user_config, app_config)
+    try:
+        refresh_token = get_state_store(app_config).get_refresh_token(
+            username, user_config
+        )
+        access_token = await api.call(
+            token_cache.get_access_token, username, refresh_token, api.api, on_refresh
+        )
     except Exception as e:
         logger.log_critical(username, "Token refresh failed", e)
         return
@@ -69,16 +108,81 @@ def process_user(username, user_config, app_config, api, monitors, notifiers):
     for monitor in monitors:
         try:
             logger.console_print(f"\nRunning {monitor.__class__.__name__}...", indent=2)
-            monitor.run(access_token, notifiers)
+            await monitor.arun(access_token, notifiers, api)
         except Exception as e:
             logger.log_critical(username, f"{monitor.__class__.__name__} failed", e)
 
-    if not user_config.get("state"):
-        user_config["state"] = {}
+    if any(monitor.auth_failed for monitor in monitors):
+        token_cache.invalidate(username)
 
-    user_config["state"]["last_successful_run"] = datetime.now().isoformat()
-    save_user_config(username, user_config, app_config["paths"]["config_dir"])
-    logger.console_success("User processing completed", indent=2)
+    await asyncio.to_thread(finish_user, username, user_config, app_config)
+
+
+def create_monitors(username, user_config, app_config, api):
+    return [
+        GradeMonitor(username, user_config, app_config, api),
+        ScheduleMonitor(username, user_config, app_config, api),
+    ]
+
+
+def process_users(user_configs, app_config, api, notifiers, monitors, workers=1):
+    if workers <= 1 or len(user_configs) <= 1:
+        for username, user_config in user_configs.items():
+            process_user(
+                username, user_config, app_config, api, monitors[username], notifiers
+            )
+        return
+
+    logger.console_info(
+        f"Processing {len(user_configs)} user(s) with {workers} worker(s)"
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                process_user,
+                username,
+                user_config,
+                app_config,
+                api,
+                monitors[username],
+                notifiers,
+            ): username
+            for username, user_config in user_configs.items()
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.log_critical(futures[future], "User processing failed", e)
+
+
+async def process_users_async(
+    user_configs, app_config, api, notifiers, monitors, limit=20
+):
+    logger.console_info(
+        f"Processing {len(user_configs)} user(s) asynchronously (limit {limit})"
+    )
+    limiter = asyncio.Semaphore(limit)
+    async_api = AsyncSomTodayAPI(api, limiter)
+    async_notifiers = [AsyncNotifier(notifier, limiter) for notifier in notifiers]
+
+    results = await asyncio.gather(
+        *(
+            process_user_async(
+                username,
+                user_config,
+                app_config,
+                async_api,
+                monitors[username],
+                async_notifiers,
+            )
+            for username, user_config in user_configs.items()
+        ),
+        return_exceptions=True,
+    )
+    for username, result in zip(user_configs, results):
+        if isinstance(result, Exception):
+            logger.log_critical(username, "User processing failed", result)
 
 
 def check_hourly_errors(user_configs, notifiers):
@@ -115,85 +219,244 @@ def check_hourly_errors(user_configs, notifiers):
     logger.console_success("Error notifications sent and cleared", indent=2)
 
 
-def main():
-    logger.console_print("\n" + "*" * 20)
-    logger.console_print("*" + " " * 18 + "*")
-    logger.console_print(f"*{'SomPlus':^18}*")
-    logger.console_print("*" + " " * 18 + "*")
-    logger.console_print("*" * 20 + "\n")
-
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    config_path = os.path.join(base_dir, "config", "app.json")
+def log_metrics():
+    for name, value in sorted(metrics.end_cycle().items()):
+        logger.console_info(
+            f"{name.replace('_', ' ').capitalize()}: {value} this cycle, "
+            f"{metrics.get_total(name)} total"
+        )
 
-    logger.console_info(f"Loading configuration from: {config_path}")
-    try:
-        app_config = load_json(config_path)
-        app_config["paths"] = {
-            "config_dir": os.path.join(base_dir, "config"),
-            "data_dir": os.path.join(base_dir, "data"),
-            "logs_dir": os.path.join(base_dir, "logs"),
-        }
-    except Exception as e:
-        logger.log_warning("system", "Failed to load configuration", e)
-        return
 
-    try:
-        logger.init_logging(app_config["paths"]["logs_dir"])
-        logger.console_success(
-            f"Initialized logging: {app_config['paths']['logs_dir']}"
+def log_pool_stats(api):
+    for host, stats in api.get_pool_stats().items():
+        logger.console_info(
+            f"HTTP pool {host}: {stats['requests']} request(s), "
+            f"{stats['reused']} reused / {stats['new']} new connection(s)"
         )
-    except Exception as e:
-        logger.log_warning("system", "Failed to initialize logging", e)
-        return
 
-    try:
-        api = SomTodayAPI(
-            app_config["somtoday"]["api_base"],
-            app_config["somtoday"]["oauth_url"],
-            app_config["somtoday"]["client_id"],
-            app_config["somtoday"].get("pagination_size", 100),
-        )
-        logger.console_success("Initialized API client")
-    except Exception as e:
-        logger.log_warning("system", "Failed to initialize API client", e)
-        return
 
-    try:
-        user_configs = load_all_user_configs(app_config["paths"]["config_dir"])
-        logger.console_success(
-            f"Loaded {len(user_configs)} user configuration(s): {', '.join(user_configs.keys())}"
-        )
-    except Exception as e:
-        logger.log_warning("system", "Failed to load user configurations", e)
-        return
+class Runtime:
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.config_path = os.path.join(base_dir, "config", "app.json")
+        self.app_config = None
+        self.app_config_mtime = None
+        self.api = None
+        self.notifiers = None
+        self.loop = None
+        self.user_configs = {}
+        self.user_mtimes = {}
+        self.monitors = {}
+        self.log_day = None
+        self.rotated_day = None
+
+    def load(self):
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError as e:
+            logger.log_warning("system", "Failed to load configuration", e)
+            return self.app_config is not None
 
-    try:
-        notifiers = [PushSaferNotifier(), DiscordNotifier()]
-        logger.console_success(f"Initialized {len(notifiers)} notifier(s)\n")
-    except Exception as e:
-        logger.log_warning("system", "Failed to initialize notifiers", e)
-        return
+        if mtime != self.app_config_mtime and self.load_app_config():
+            self.app_config_mtime = mtime
 
-    check_hourly_errors(user_configs, notifiers)
+        if self.app_config is None:
+            return False
 
-    for username, user_config in user_configs.items():
-        monitors = [
-            GradeMonitor(username, user_config, app_config, api),
-            ScheduleMonitor(username, user_config, app_config, api),
-        ]
-        process_user(username, user_config, app_config, api, monitors, notifiers)
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self.log_day != today:
+            logger.load_error_tracking()
+            self.log_day = today
 
-    logger.console_print(f"\n{'=' * 60}")
-    try:
-        daily_retention = app_config["logging"]["daily_log_retention"]
-        error_retention = app_config["logging"].get("error_log_retention", 30)
-        logger.console_info(
-            f"Rotating logs (daily: {daily_retention} days, errors: {error_retention} days)..."
-        )
-        logger.rotate_logs(daily_retention, error_retention)
-        logger.console_success("Completed log rotation")
-    except Exception as e:
-        logger.log_warning("system", "Failed to rotate logs", e)
+        if self.notifiers is None:
+            try:
+                self.notifiers = [PushSaferNotifier(), DiscordNotifier()]
+                logger.console_success(
+                    f"Initialized {len(self.notifiers)} notifier(s)\n"
+                )
+            except Exception as e:
+                logger.log_warning("system", "Failed to initialize notifiers", e)
+                return False
+
+        return self.load_user_configs()
+
+    def load_app_config(self):
+        logger.console_info(f"Loading configuration from: {self.config_path}")
+        try:
+            app_config = load_json(self.config_path)
+            app_config["paths"] = {
+                "config_dir": os.path.join(self.base_dir, "config"),
+                "data_dir": os.path.join(self.base_dir, "data"),
+                "logs_dir": os.path.join(self.base_dir, "logs"),
+            }
+        except Exception as e:
+            logger.log_warning("system", "Failed to load configuration", e)
+            return False
+
+        try:
+            logger.init_logging(app_config["paths"]["logs_dir"])
+            logger.console_success(
+                f"Initialized logging: {app_config['paths']['logs_dir']}"
+            )
+        except Exception as e:
+            logger.log_warning("system", "Failed to initialize logging", e)
+            return False
+
+        try:
+            api = create_api(app_config)
+            logger.console_success("Initialized API client")
+        except Exception as e:
+            logger.log_warning("system", "Failed to initialize API client", e)
+            return False
+
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
+
+        self.app_config = app_config
+        self.api = api
+        self.monitors = {}
+        self.log_day = datetime.now().strftime("%Y-%m-%d")
+        return True
+
+    def load_user_configs(self):
+        users_dir = os.path.join(self.app_config["paths"]["config_dir"], "users")
+        loaded = []
+
+        try:
+            filenames = os.listdir(users_dir) if os.path.exists(users_dir) else []
+            usernames = set()
+
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+
+                username = filename[:-5]
+                path = os.path.join(users_dir, filename)
+                mtime = os.stat(path).st_mtime_ns
+                usernames.add(username)
+
+                known_mtimes = (self.user_mtimes.get(username), saved_mtimes.get(path))
+                if username in self.user_configs and mtime in known_mtimes:
+                    self.user_mtimes[username] = mtime
+                    continue
+
+                self.user_configs[username] = load_json(path)
+                self.user_mtimes[username] = mtime
+                self.monitors.pop(username, None)
+                loaded.append(username)
+
+            for username in set(self.user_configs) - usernames:
+                del self.user_configs[username]
+                self.user_mtimes.pop(username, None)
+                self.monitors.pop(username, None)
+        except Exception as e:
+            logger.log_warning("system", "Failed to load user configurations", e)
+            return False
+
+        if loaded:
+            logger.console_success(
+                f"Loaded {len(loaded)} user configuration(s): {', '.join(loaded)}"
+            )
+        return True
+
+    def get_monitors(self):
+        for username, user_config in self.user_configs.items():
+            if username not in self.monitors:
+                self.monitors[username] = create_monitors(
+                    username, user_config, self.app_config, self.api
+                )
+        return self.monitors
+
+    def get_event_loop(self, limit):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop.set_default_executor(ThreadPoolExecutor(max_workers=limit))
+        return self.loop
+
+    def run_cycle(self, jobs=None):
+        app_config = self.app_config
+        check_hourly_errors(self.user_configs, self.notifiers)
+        user_configs = self.user_configs
+        monitors = self.get_monitors()
+
+        if jobs is not None:
+            user_configs = {u: c for u, c in user_configs.items() if u in jobs}
+            monitors = {
+                username: [m for m in monitors[username] if m.name in jobs[username]]
+                for username in user_configs
+            }
+
+        if config.get(app_config, "concurrency.mode") == "async":
+            async_limit = config.get(app_config, "concurrency.async_limit", 20)
+            loop = self.get_event_loop(async_limit)
+            loop.run_until_complete(
+                process_users_async(
+                    user_configs,
+                    app_config,
+                    self.api,
+                    self.notifiers,
+                    monitors,
+                    async_limit,
+                )
+            )
+        else:
+            user_workers = config.get(app_config, "concurrency.user_workers", 1)
+            process_users(
+                user_configs,
+                app_config,
+                self.api,
+                self.notifiers,
+                monitors,
+                user_workers,
+            )
+
+        logger.console_print(f"\n{'=' * 60}")
+        log_pool_stats(self.api)
+        log_metrics()
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self.rotated_day == today:
+            return
+
+        try:
+            daily_retention = app_config["logging"]["daily_log_retention"]
+            error_retention = app_config["logging"].get("error_log_retention", 30)
+            logger.console_info(
+                f"Rotating logs (daily: {daily_retention} days, errors: {error_retention} days)..."
+            )
+            logger.rotate_logs(daily_retention, error_retention)
+            logger.console_success("Completed log rotation")
+            self.rotated_day = today
+        except Exception as e:
+            logger.log_warning("system", "Failed to rotate logs", e)
+
+
+def create_api(app_config):
+    return SomTodayAPI(
+        app_config["somtoday"]["api_base"],
+        app_config["somtoday"]["oauth_url"],
+        app_config["somtoday"]["client_id"],
+        app_config["somtoday"].get("pagination_size", 100),
+        pool_size=app_config["somtoday"].get("pool_size", 10),
+        parallel_pagination=app_config["somtoday"].get("parallel_pagination", False),
+        pagination_workers=app_config["somtoday"].get("pagination_workers", 4),
+        schedule_range_weeks=app_config["somtoday"].get("schedule_range_weeks", 8),
+    )
+
+
+def main():
+    logger.console_print("\n" + "*" * 20)
+    logger.console_print("*" + " " * 18 + "*")
+    logger.console_print(f"*{'SomPlus':^18}*")
+    logger.console_print("*" + " " * 18 + "*")
+    logger.console_print("*" * 20 + "\n")
+
+    runtime = Runtime(os.path.dirname(os.path.abspath(__file__)))
+    if not runtime.load():
+        return
+
+    runtime.run_cycle()
 
     logger.console_print("\n" + "*" * 60)
     logger.console_success("All tasks completed successfully!")
@@ -4,9 +4,12 @@ import os
 import sys
 import json
 import time
+import zlib
+import heapq
+import itertools
 from datetime import datetime
-from lib.utils import logger
-from run import main as run_main
+from lib.utils import logger, config
+from run import main as run_main, Runtime
 
 
 def load_json(path):
@@ -14,7 +17,7 @@ def load_json(path):
         return json.load(f)
 
 
-def get_current_time_window(sleep_schedule):
+def find_time_window(sleep_schedule):
     now = datetime.now()
     current_hour = now.hour
     current_minute = now.minute
@@ -32,24 +35,154 @@ def get_current_time_window(sleep_schedule):
                 current_time_minutes >= start_minutes
                 or current_time_minutes < end_minutes
             ):
-                return window["sleep"]
+                return window
         else:
             if start_minutes <= current_time_minutes < end_minutes:
-                return window["sleep"]
+                return window
+
+    return None
+
+
+def get_current_time_window(sleep_schedule):
+    window = find_time_window(sleep_schedule)
+    if window is not None:
+        return window["sleep"]
 
     logger.log_warning("scheduler", "No matching time window found, using default 300s")
     return 300
 
 
-def run_monitor():
+def get_monitor_interval(sleep_schedule, monitor_name):
+    window = find_time_window(sleep_schedule)
+    if window is None:
+        return 300
+
+    return window.get("intervals", {}).get(monitor_name, window["sleep"])
+
+
+class JobQueue:
+    def __init__(self):
+        self.heap = []
+        self.jobs = set()
+        self.counter = itertools.count()
+
+    def schedule(self, due, username, monitor_name):
+        key = (username, monitor_name)
+        if key in self.jobs:
+            return
+
+        self.jobs.add(key)
+        heapq.heappush(self.heap, (due, next(self.counter), username, monitor_name))
+
+    def next_due(self):
+        if not self.heap:
+            return None
+        return self.heap[0][0]
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due_time, _, username, monitor_name = heapq.heappop(self.heap)
+            self.jobs.discard((username, monitor_name))
+            due.append((username, monitor_name, due_time))
+        return due
+
+
+def get_next_tick(tick, interval, now):
+    next_tick = tick + interval
+    skipped = 0
+    if next_tick <= now:
+        skipped = int((now - next_tick) // interval) + 1
+        next_tick += skipped * interval
+    return next_tick, skipped
+
+
+def get_start_offset(username, interval):
+    return (zlib.crc32(username.encode()) % 1000) / 1000 * interval
+
+
+def run_monitor(runtime=None, jobs=None):
     try:
-        run_main()
+        if runtime is None:
+            run_main()
+            return True
+
+        if jobs is None and not runtime.load():
+            return False
+        runtime.run_cycle(jobs)
         return True
     except Exception as e:
         logger.log_error("scheduler", "Monitor execution failed", e)
         return False
 
 
+def run_queue(runtime, sleep_schedule, fixed_rate=False, stagger=False):
+    queue = JobQueue()
+
+    while True:
+        if runtime.load():
+            sleep_schedule = config.get(
+                runtime.app_config, "scheduler.sleep_schedule", sleep_schedule
+            )
+            now = time.time()
+            for username, monitors in runtime.get_monitors().items():
+                for monitor in monitors:
+                    due = now
+                    if stagger:
+                        interval = get_monitor_interval(sleep_schedule, monitor.name)
+                        due += get_start_offset(username, interval)
+                    queue.schedule(due, username, monitor.name)
+
+        jobs = {}
+        due_times = {}
+        for username, monitor_name, due in queue.pop_due(time.time()):
+            if username in runtime.user_configs:
+                jobs.setdefault(username, set()).add(monitor_name)
+                due_times[(username, monitor_name)] = due
+
+        if jobs:
+            now = datetime.now()
+            logger.console_print(f"\n{'─' * 60}")
+            logger.console_info(
+                f"{sum(len(names) for names in jobs.values())} job(s) due - "
+                f"{now.strftime('%Y-%m-%d %H:%M:%S')}"
+            )
+            for username, names in jobs.items():
+                logger.console_print(
+                    f"{username}: {', '.join(sorted(names))}", indent=2
+                )
+            logger.console_print(f"{'─' * 60}")
+
+            if not run_monitor(runtime, jobs):
+                logger.log_warning("scheduler", "Monitor completed with errors")
+
+            finished = time.time()
+            skipped_total = 0
+            for username, names in jobs.items():
+                for name in names:
+                    interval = get_monitor_interval(sleep_schedule, name)
+                    if fixed_rate:
+                        due, skipped = get_next_tick(
+                            due_times[(username, name)], interval, finished
+                        )
+                        skipped_total += skipped
+                    else:
+                        due = finished + interval
+                    queue.schedule(due, username, name)
+
+            if skipped_total:
+                logger.log_warning(
+                    "scheduler",
+                    f"Jobs overran their interval, skipped {skipped_total} tick(s)",
+                )
+
+        next_due = queue.next_due()
+        delay = 60 if next_due is None else max(next_due - time.time(), 0)
+        if delay > 0:
+            logger.console_print(f"\nSleeping for {delay:.0f}s until next job...\n")
+            time.sleep(delay)
+
+
 def main():
     logger.console_print("\n" + "=" * 60)
     logger.console_print(f"{'SomPlus Scheduler':^60}")
@@ -74,21 +207,42 @@ def main():
     sleep_schedule = app_config["scheduler"]["sleep_schedule"]
     logger.console_success(f"Loaded {len(sleep_schedule)} time window(s)")
 
+    runtime = None
+    if app_config["scheduler"].get("daemon", True):
+        runtime = Runtime(base_dir)
+        logger.console_info("Daemon mode: keeping clients and configs loaded")
+
     logger.console_print("\nTime windows:")
     for i, window in enumerate(sleep_schedule, 1):
         start = f"{window['start'][0]:02d}:{window['start'][1]:02d}"
         end = f"{window['end'][0]:02d}:{window['end'][1]:02d}"
+        intervals = "".join(
+            f", {name} every {seconds}s"
+            for name, seconds in window.get("intervals", {}).items()
+        )
         logger.console_print(
-            f"  {i}. {start} - {end}: check every {window['sleep']}s", indent=2
+            f"  {i}. {start} - {end}: check every {window['sleep']}s{intervals}",
+            indent=2,
         )
 
     logger.console_print("\n" + "=" * 60)
     logger.console_success("Scheduler started - running continuously")
     logger.console_print("=" * 60 + "\n")
 
+    fixed_rate = config.get(app_config, "scheduler.timing") == "fixed_rate"
+    if config.get(app_config, "scheduler.mode") == "queue":
+        stagger = config.get(app_config, "scheduler.stagger", False)
+        run_queue(runtime or Runtime(base_dir), sleep_schedule, fixed_rate, stagger)
+        return
+
     cycle = 0
+    tick = time.time()
     while True:
         cycle += 1
+        if runtime is not None and runtime.app_config is not None:
+            sleep_schedule = config.get(
+                runtime.app_config, "scheduler.sleep_schedule", sleep_schedule
+            )
         current_sleep = get_current_time_window(sleep_schedule)
         now = datetime.now()
 
@@ -97,15 +251,25 @@ def main():
         logger.console_print(f"Current interval: {current_sleep}s", indent=2)
         logger.console_print(f"{'─' * 60}")
 
-        success = run_monitor()
+        success = run_monitor(runtime)
 
         if success:
             logger.console_success("Monitor completed successfully")
         else:
             logger.log_warning("scheduler", "Monitor completed with errors")
 
-        logger.console_print(f"\nSleeping for {current_sleep}s until next check...\n")
-        time.sleep(current_sleep)
+        delay = current_sleep
+        if fixed_rate:
+            tick, skipped = get_next_tick(tick, current_sleep, time.time())
+            if skipped:
+                logger.log_warning(
+                    "scheduler",
+                    f"Cycle overran its interval, skipped {skipped} tick(s)",
+                )
+            delay = max(tick - time.time(), 0)
+
+        logger.console_print(f"\nSleeping for {delay:.0f}s until next check...\n")
+        time.sleep(delay)
 
 
 if __name__ == "__main__":